@@ -1,7 +1,12 @@
 import streamlit as st
 from pathlib import Path
-import shutil
 import time
+from utils.cache import profile_cache
+from utils.data_utils import DataProfiler
+from utils.governor import governor
+from utils.registry import add_dataset
+from utils.store import dataset_store, shared_frame
+from utils.widgets import session_key
 
 # Set page config as the FIRST Streamlit command
 st.set_page_config(page_title="Data Profiling & EDA", page_icon="📊", layout="wide")
@@ -140,16 +145,25 @@ if 'user' not in st.session_state:
     st.session_state.user = None
 if 'uploads_dir' not in st.session_state:
     st.session_state.uploads_dir = Path("data/uploads")
-if 'df_list' not in st.session_state:
-    st.session_state.df_list = []
-if 'profilers' not in st.session_state:
-    st.session_state.profilers = []
+if 'datasets' not in st.session_state:
+    st.session_state.datasets = {}
 if 'logout_button_counter' not in st.session_state:
     st.session_state.logout_button_counter = 0
 
 # Ensure uploads directory exists
 st.session_state.uploads_dir.mkdir(parents=True, exist_ok=True)
 
+# Reopen this user's files from the store once per login; frames are read on first use
+# and shared with other sessions holding the same content
+if st.session_state.user and st.session_state.get("restored_user") != st.session_state.user:
+    store = dataset_store(st.session_state.uploads_dir)
+    for name, content_hash, path, approximate in store.refs(st.session_state.user):
+        profiler = DataProfiler(None, fingerprint=content_hash, approximate=approximate,
+                                loader=lambda path=path: shared_frame(path))
+        add_dataset(st.session_state.datasets, st.session_state.user, name, profiler, path)
+        store.hold(st.session_state.user, name, session_key())
+    st.session_state.restored_user = st.session_state.user
+
 # Define navigation with nested structure
 pages = {
     "Your account": [
@@ -175,12 +189,16 @@ with st.sidebar:
     # User info and logout
     if st.session_state.user:
         st.markdown(f"Logged in as: **{st.session_state.user}**")
+        cache_stats = profile_cache.stats()
+        st.caption(f"Profile cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+                   f"{cache_stats['size_bytes'] / 1024 ** 2:.1f} / {cache_stats['max_bytes'] / 1024 ** 2:.0f} MB")
         if st.button("Logout", key="logout_button"):
-            shutil.rmtree(st.session_state.uploads_dir, ignore_errors=True)
+            # Only this session's references go; files other sessions or users hold are kept
+            dataset_store(st.session_state.uploads_dir).release_session(st.session_state.user, session_key())
+            governor.release(session_key())
             st.session_state.user = None
-            st.session_state.df_list = []
-            st.session_state.profilers = []
-            st.session_state.uploads_dir.mkdir(parents=True, exist_ok=True)
+            st.session_state.restored_user = None
+            st.session_state.datasets = {}
             st.markdown(f'''
                 <div class="success-box">
                     <span class="material-icons md-18">check_circle</span> Logged out successfully
@@ -0,0 +1,55 @@
+"""Times every installed compute backend against pandas; tests/test_backends.py checks
+that their results match.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.backends --sizes 10k 1m --shapes narrow wide
+"""
+import argparse
+import sys
+
+from benchmarks.datasets import SHAPES, SIZES, synthetic_csv
+from benchmarks.run import DEFAULT_DATA_DIR, measure
+from utils.backends import get_backend, installed_backends
+from utils.dtypes import is_categorical, is_numeric
+from utils.ingest import read_csv_chunked
+
+
+def time_backends(df, backends, repeat=3):
+    """Returns {(backend, task): seconds} for profiling, a group cube and Pearson correlation."""
+    numeric = [col for col in df.columns if is_numeric(df.dtypes[col])]
+    group_col = next(col for col in df.columns if is_categorical(df.dtypes[col]))
+    timings = {}
+    for name in backends:
+        backend = get_backend(name)
+        tasks = {
+            "profile": lambda: backend.profile(df),
+            "group_cube": lambda: backend.group_cube(df, group_col, numeric),
+            "pearson": lambda: backend.correlation(df, numeric, "Pearson"),
+        }
+        for task, func in tasks.items():
+            timings[name, task] = measure(func, repeat)[0]
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k"])
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per task; the best is kept")
+    args = parser.parse_args(argv)
+
+    backends = [name for name in installed_backends() if name != "pandas"]
+    if not backends:
+        print("Only the pandas backend is installed: pip install polars duckdb")
+    for shape in args.shapes:
+        for size in args.sizes:
+            df, _ = read_csv_chunked(synthetic_csv(DEFAULT_DATA_DIR, size, shape, seed=0))
+            for (name, task), seconds in time_backends(df, ["pandas"] + backends, args.repeat).items():
+                key = f"{shape}/{size}/{name}/{task}"
+                print(f"{key:<40} {seconds:>10.4f} s", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
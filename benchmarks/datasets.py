@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Row counts of the synthetic datasets, by the label used on the command line
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+# Shape label -> (numeric columns, categorical columns) besides the id and date columns
+SHAPES = {"narrow": (4, 2), "wide": (60, 10)}
+# Rows generated at a time when writing a CSV, bounding the generator's memory
+GENERATE_CHUNK_ROWS = 500_000
+# Fraction of missing values in every other numeric column
+MISSING_RATE = 0.05
+
+
+def synthetic_frame(n_rows, shape="narrow", seed=0, start=0):
+    """Returns a mixed-dtype frame: an integer id, a datetime, numeric columns (some
+    integer, some float with missing values) and low-cardinality string columns.
+
+    `start` offsets the ids and dates so chunks of one dataset line up.
+    """
+    n_numeric, n_categorical = SHAPES[shape]
+    rng = np.random.default_rng([seed, start])
+    columns = {
+        "id": np.arange(start, start + n_rows),
+        "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(np.arange(start, start + n_rows) % 1_000_000, unit="min"),
+    }
+    for i in range(n_numeric):
+        if i % 3 == 0:
+            columns[f"num_{i}"] = rng.integers(0, 1_000, n_rows)
+        else:
+            values = rng.normal(loc=i, scale=1 + i, size=n_rows)
+            if i % 2:
+                values[rng.random(n_rows) < MISSING_RATE] = np.nan
+            columns[f"num_{i}"] = values
+    for i in range(n_categorical):
+        levels = np.array([f"cat{i}_{level}" for level in range(5 + 10 * i)])
+        columns[f"cat_{i}"] = levels[rng.integers(0, len(levels), n_rows)]
+    return pd.DataFrame(columns)
+
+
+def synthetic_csv(directory, size, shape="narrow", seed=0):
+    """Writes a synthetic dataset as CSV once and returns its path; later calls reuse it."""
+    n_rows = SIZES[size]
+    path = Path(directory) / f"{shape}_{size}_{seed}.csv"
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+    with open(partial, "w", newline="") as out:
+        for start in range(0, n_rows, GENERATE_CHUNK_ROWS):
+            chunk = synthetic_frame(min(GENERATE_CHUNK_ROWS, n_rows - start), shape, seed, start)
+            chunk.to_csv(out, header=start == 0, index=False)
+    partial.rename(path)
+    return path
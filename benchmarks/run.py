@@ -0,0 +1,168 @@
+"""Benchmarks ingestion, profiling, chart preparation and comparison outside Streamlit.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.run --sizes 10k 1m --shapes narrow wide
+    python -m benchmarks.run --check               # exit 1 on regressions against the baseline
+    python -m benchmarks.run --save-baseline       # record the current timings as the baseline
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.datasets import SHAPES, SIZES, synthetic_csv
+from utils.aggregation import group_cube
+from utils.cache import fingerprint
+from utils.chart_utils import DEFAULT_MAX_POINTS, box_data, downsample_line, downsample_scatter, histogram_data
+from utils.compare import metrics_matrix
+from utils.correlation import correlation_matrix
+from utils.data_utils import DataProfiler
+from utils.diff import diff_frames
+from utils.drift import drift_report
+from utils.dtypes import is_categorical, is_numeric
+from utils.ingest import read_csv_chunked
+from utils.profiling import build_profile
+from utils.registry import Dataset
+from utils.sketches import build_approximate_profile
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_DATA_DIR = BENCH_DIR / "data"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+# Slowdown (as a fraction of the baseline) tolerated before a result counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Absolute slack so timer noise on very fast benchmarks is not reported
+MIN_REGRESSION_SECONDS = 0.01
+MIN_REGRESSION_MB = 1.0
+
+
+class Context:
+    """The parsed datasets a benchmark run works on."""
+
+    def __init__(self, path, df, profile, other_df, other_profile):
+        self.path = path
+        self.df = df
+        self.profile = profile
+        self.other_df = other_df
+        self.other_profile = other_profile
+        self.numeric = [col for col in df.columns if is_numeric(df.dtypes[col])]
+        self.categorical = [col for col in df.columns if is_categorical(df.dtypes[col])]
+
+
+def _datasets(ctx):
+    datasets = []
+    for name, df, profile in (("baseline", ctx.df, ctx.profile), ("current", ctx.other_df, ctx.other_profile)):
+        datasets.append(Dataset(name, DataProfiler(df, fingerprint=name, profile=profile)))
+    return datasets
+
+
+# Name -> function of a Context; chart entries mirror the data preparation in analyse_data.py
+BENCHMARKS = {
+    "ingest_csv": lambda ctx: read_csv_chunked(ctx.path),
+    "ingest_csv_pandas": lambda ctx: read_csv_chunked(ctx.path, engine="pandas"),
+    "fingerprint": lambda ctx: fingerprint(ctx.df),
+    "profile_exact": lambda ctx: build_profile(ctx.df),
+    "profile_approximate": lambda ctx: build_approximate_profile(ctx.df),
+    "chart_histogram": lambda ctx: [histogram_data(ctx.df[col], nbins=30) for col in ctx.numeric],
+    "chart_box": lambda ctx: [box_data(ctx.df[col], max_outliers=DEFAULT_MAX_POINTS) for col in ctx.numeric],
+    "chart_scatter": lambda ctx: downsample_scatter(ctx.df, ctx.numeric[0], ctx.numeric[1], max_points=DEFAULT_MAX_POINTS),
+    "chart_bar": lambda ctx: [group_cube(ctx.df, col, ctx.numeric).aggregate(ctx.numeric[0], "mean")
+                              for col in ctx.categorical],
+    "chart_line": lambda ctx: [downsample_line(ctx.df[col], max_points=DEFAULT_MAX_POINTS) for col in ctx.numeric],
+    "chart_pie": lambda ctx: [ctx.profile.value_counts(col) for col in ctx.categorical],
+    "chart_heatmap": lambda ctx: correlation_matrix(ctx.df, ctx.numeric, "Pearson"),
+    "compare_metrics": lambda ctx: metrics_matrix(_datasets(ctx)),
+    "compare_drift": lambda ctx: drift_report(ctx.profile, ctx.other_profile),
+    "compare_diff": lambda ctx: diff_frames(ctx.df, ctx.other_df, ["id"]),
+}
+
+
+def measure(func, repeat=3):
+    """Returns the best wall time of `repeat` calls in seconds and the peak memory
+    allocated during a separate traced call in MB."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    # Traced separately so tracing overhead does not distort the timings
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1024 / 1024
+
+
+def run_suite(sizes, shapes, names=None, data_dir=DEFAULT_DATA_DIR, repeat=3):
+    """Runs the benchmarks on every size and shape. Returns {"shape/size/name":
+    {"seconds": ..., "peak_mb": ...}}."""
+    results = {}
+    for shape in shapes:
+        for size in sizes:
+            path = synthetic_csv(data_dir, size, shape, seed=0)
+            other_path = synthetic_csv(data_dir, size, shape, seed=1)
+            df, profile = read_csv_chunked(path)
+            other_df, other_profile = read_csv_chunked(other_path)
+            ctx = Context(path, df, profile, other_df, other_profile)
+            # Large datasets are timed once to keep the suite's run time bounded
+            runs = repeat if len(df) <= SIZES["1m"] else 1
+            for name, func in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                seconds, peak_mb = measure(lambda: func(ctx), runs)
+                key = f"{shape}/{size}/{name}"
+                results[key] = {"seconds": round(seconds, 4), "peak_mb": round(peak_mb, 1)}
+                print(f"{key:<40} {seconds:>10.4f} s {peak_mb:>10.1f} MB", flush=True)
+    return results
+
+
+def regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns a description of every result that is slower or uses more memory than its
+    baseline by more than the tolerance."""
+    found = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, unit, slack in (("seconds", "s", MIN_REGRESSION_SECONDS), ("peak_mb", "MB", MIN_REGRESSION_MB)):
+            limit = base[metric] * (1 + tolerance)
+            if result[metric] > limit and result[metric] - base[metric] > slack:
+                found.append(f"{key}: {metric} {result[metric]}{unit} vs baseline {base[metric]}{unit}")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k"])
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES))
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark; the best is kept")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR, help="Where synthetic CSVs are cached")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Merge these results into the baseline file")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--out", type=Path, help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.shapes, args.only, args.data_dir, args.repeat)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+    if args.check:
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
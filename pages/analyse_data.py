@@ -1,8 +1,16 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+from utils.aggregation import AGGREGATIONS
+from utils.correlation import CORRELATION_METHODS, HEATMAP_LABEL_COLUMNS, top_pairs
 from utils.data_utils import DataProfiler
-import time
+from utils.edits import has_changes, merge_page_edits
+from utils.export import EXPORT_FORMATS
+from utils.registry import dataset_names
+from utils.paging import PAGE_SIZES, WINDOW_THRESHOLD_ROWS, page_count, page_positions
+from utils.metrics import stage
+from utils.widgets import UPLOAD_TYPES, await_job, end_rerun, govern_memory, ingest_new_uploads, plotly_chart, release_job, start_rerun
+from utils.chart_utils import DEFAULT_MAX_POINTS, box_data, box_data_from_profile, downsample_scatter, histogram_data
 import plotly.express as px
 import plotly.graph_objects as go
 
@@ -47,6 +55,9 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Time this run; stages are marked with stage()
+start_rerun("analyse_data")
+
 # Page title
 st.subheader("Data Analysis")
 
@@ -69,38 +80,14 @@ with st.container():
         </h5>
     ''', unsafe_allow_html=True)
     st.markdown("")
-    uploaded_files = st.file_uploader("Upload CSV files for analysis", type=["csv"], accept_multiple_files=True, key="analysis_uploader")
+    uploaded_files = st.file_uploader("Upload CSV files (plain, .gz, .bz2, .zst or zipped) for analysis", type=UPLOAD_TYPES, accept_multiple_files=True, key="analysis_uploader")
 
-# Process uploaded files only if they haven't been processed before
-if uploaded_files:
-    for uploaded_file in uploaded_files:
-        if uploaded_file.name not in [name for name, _ in st.session_state.df_list]:
-            with st.spinner(f"Processing {uploaded_file.name}..."):
-                try:
-                    df = pd.read_csv(uploaded_file)
-                    profiler = DataProfiler(df)
-                    file_path = st.session_state.uploads_dir / f"{st.session_state.user}_{uploaded_file.name}"
-                    df.to_csv(file_path, index=False)
-                    st.session_state.df_list.append((uploaded_file.name, df))
-                    st.session_state.profilers.append((uploaded_file.name, profiler))
-                    st.markdown(f'''
-                        <div class="success-box">
-                            <span class="material-icons">check_circle</span> Loaded {uploaded_file.name}
-                        </div>
-                    ''', unsafe_allow_html=True)
-                    st.toast(f"Loaded {uploaded_file.name}")
-                    time.sleep(1)
-                except Exception as e:
-                    st.markdown(f'''
-                        <div class="error-box">
-                            <span class="material-icons">error</span> Error processing {uploaded_file.name}: {e}
-                        </div>
-                    ''', unsafe_allow_html=True)
-                    st.toast(f"Failed to load {uploaded_file.name}")
-                    time.sleep(1)
+stage("upload")
+# Ingest new uploads concurrently; files already in the session are skipped
+ingest_new_uploads(uploaded_files)
 
 # Check if there are datasets available
-if not st.session_state.df_list:
+if not st.session_state.datasets:
     st.markdown("")
     st.markdown("")
     st.markdown(f'''
@@ -109,6 +96,7 @@ if not st.session_state.df_list:
         </div>
     ''', unsafe_allow_html=True)
 else:
+    stage("select")
     # Select dataset
     with st.container():
         st.markdown("")
@@ -117,10 +105,16 @@ else:
                 <span class="material-icons">dataset</span> Select Dataset
             </h3>
         ''', unsafe_allow_html=True)
-        selected_file = st.selectbox("Select a dataset", [name for name, _ in st.session_state.df_list])
-        selected_df = next(df for name, df in st.session_state.df_list if name == selected_file)
-        selected_profiler = next(p for name, p in st.session_state.profilers if name == selected_file)
+        names = dataset_names(st.session_state.datasets)
+        selected_id = st.selectbox("Select a dataset", list(names), format_func=names.get)
+        selected_dataset = st.session_state.datasets[selected_id]
+        # Idle datasets are spilled to disk when the session is over its memory budget
+        govern_memory([selected_dataset])
+        selected_file = selected_dataset.name
+        selected_df = selected_dataset.df
+        selected_profiler = selected_dataset.profiler
 
+    stage("editor")
     # Edit Data
     with st.container():
         st.markdown("")
@@ -130,28 +124,95 @@ else:
                 <span class="material-icons">edit</span> Edit Data
             </h3>
         ''', unsafe_allow_html=True)
-        edited_df = st.data_editor(
-            selected_df,
-            use_container_width=True,
-            column_config={
-                col: st.column_config.Column(
-                    help=f"Edit values in {col}",
-                    disabled=False
-                ) for col in selected_df.columns
-            }
+        paginated = st.toggle(
+            "Paginated editor",
+            value=len(selected_df) > WINDOW_THRESHOLD_ROWS,
+            key=f"paginated_{selected_file}",
+            help="Edit the dataset one page at a time. Sorting and filtering run on the server, so only the visible rows are sent to the browser."
         )
+        column_config = {
+            col: st.column_config.Column(
+                help=f"Edit values in {col}",
+                disabled=False
+            ) for col in selected_df.columns
+        }
+        if paginated:
+            sort_col, order_col, filter_col, text_col = st.columns(4)
+            with sort_col:
+                sort_by = st.selectbox("Sort by", [None] + list(selected_df.columns), format_func=lambda col: "(none)" if col is None else col, key=f"sort_{selected_file}")
+            with order_col:
+                ascending = st.selectbox("Order", ["Ascending", "Descending"], key=f"order_{selected_file}") == "Ascending"
+            with filter_col:
+                filter_by = st.selectbox("Filter column", [None] + list(selected_df.columns), format_func=lambda col: "(none)" if col is None else col, key=f"filter_{selected_file}")
+            with text_col:
+                filter_text = st.text_input("Contains", key=f"filter_text_{selected_file}", disabled=filter_by is None)
+            positions = selected_profiler.get_view(sort_by, ascending, filter_by, filter_text.strip() if filter_by is not None else "")
+
+            size_col, page_col = st.columns(2)
+            with size_col:
+                page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"page_size_{selected_file}")
+            n_pages = page_count(len(positions), page_size)
+            # Keep the page number valid when a filter or page size shrinks the view
+            if st.session_state.get(f"page_{selected_file}", 1) > n_pages:
+                st.session_state[f"page_{selected_file}"] = n_pages
+            with page_col:
+                page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1, step=1, key=f"page_{selected_file}")
+            shown = page_positions(positions, page, page_size)
+            page_df = selected_df.iloc[shown]
+            edited_page = st.data_editor(
+                page_df,
+                use_container_width=True,
+                column_config=column_config,
+                key=f"editor_{selected_file}_page"
+            )
+            first = (page - 1) * page_size
+            st.caption(f"Rows {min(first + 1, len(positions)):,}–{first + len(shown):,} of {len(positions):,} shown ({len(selected_df):,} in dataset)")
+            # Write the page's changes back to the dataset and fold them into the cached profile
+            editor_state = st.session_state.get(f"editor_{selected_file}_page", {})
+            edited_df = selected_df
+            changed = has_changes(editor_state)
+            if changed:
+                edited_df, revision, delta = merge_page_edits(selected_df, shown, page_df, edited_page, editor_state)
+                selected_profiler = selected_profiler.apply_delta(edited_df, delta, revision)
+        else:
+            edited_df = st.data_editor(
+                selected_df,
+                use_container_width=True,
+                column_config=column_config,
+                key=f"editor_{selected_file}"
+            )
+            # Apply the editor's cell-level changes to the cached profile instead of re-profiling
+            editor_state = st.session_state.get(f"editor_{selected_file}", {})
+            changed = has_changes(editor_state)
+            if changed:
+                selected_profiler = selected_profiler.apply_edits(edited_df, editor_state)
         # Update session state with edited data
-        for i, (name, df) in enumerate(st.session_state.df_list):
-            if name == selected_file:
-                st.session_state.df_list[i] = (name, edited_df)
-                break
-        st.download_button(
-            label="Download Edited Data",
-            data=edited_df.to_csv(index=False),
-            file_name=f"{selected_file}_edited.csv",
-            mime="text/csv"
-        )
+        if changed:
+            selected_dataset.update(selected_profiler)
+        stage("export")
+        # Exports are only serialised on request, in the background, and cached for the current revision
+        format_col, prepare_col = st.columns([3, 1])
+        with format_col:
+            export_format = st.selectbox("Download format", list(EXPORT_FORMATS), key=f"export_format_{selected_file}")
+        with prepare_col:
+            st.markdown("")
+            prepare = st.button("Prepare download", key=f"prepare_{selected_file}", use_container_width=True)
+        if prepare:
+            st.session_state[f"export_requested_{selected_file}"] = (selected_profiler.fingerprint, export_format)
+        export_data = selected_profiler.get_export(export_format, prepare=False)
+        if export_data is None and st.session_state.get(f"export_requested_{selected_file}") == (selected_profiler.fingerprint, export_format):
+            export_data = await_job("export", selected_profiler.export_task(export_format), f"Preparing {export_format} export")
+        if export_data is not None:
+            extension, mime = EXPORT_FORMATS[export_format]
+            size = f"{len(export_data) / 1024 / 1024:,.1f} MB" if len(export_data) >= 1024 * 1024 else f"{len(export_data) / 1024:,.0f} KB"
+            st.download_button(
+                label=f"Download Edited Data ({size})",
+                data=export_data,
+                file_name=f"{selected_file}_edited{extension}",
+                mime=mime
+            )
 
+    stage("profile")
     # Data Overview
     with st.container():
         st.markdown("")
@@ -162,11 +223,30 @@ else:
             </h3>
         ''', unsafe_allow_html=True)
 
+        approximate = st.toggle(
+            "Approximate statistics",
+            value=selected_profiler.approximate,
+            key=f"approximate_{selected_file}",
+            help="Use mergeable sketches (HyperLogLog, KLL, Misra-Gries) instead of exact statistics. Faster and lighter on very large datasets."
+        )
+        if approximate != selected_profiler.approximate:
+            selected_profiler = DataProfiler(edited_df, fingerprint=selected_profiler.fingerprint, approximate=approximate)
+            selected_dataset.profiler = selected_profiler
+        # Profiles that are not cached yet are built in the background
+        profile = selected_profiler.cached_profile()
+        if profile is None:
+            profile = await_job("profile", selected_profiler.profile_task(), f"Profiling {selected_file}")
+            if profile is None:
+                st.stop()
+            # Keep it on the profiler, so its getters do not rebuild a profile the cache could not hold
+            selected_profiler.set_profile(profile)
+
+        stage("overview")
         # Dataset Info
         with st.expander("Dataset Info", expanded=True):
             shape_data = pd.DataFrame({
                 "Metric": ["Rows", "Columns", "Missing Values"],
-                "Value": [len(edited_df), len(edited_df.columns), edited_df.isnull().sum().sum()]
+                "Value": [profile.n_rows, profile.n_cols, profile.total_missing]
             })
             st.markdown('<table class="styled-table"><tr><th>Metric</th><th>Value</th></tr>' +
                         ''.join(f'<tr><td>{row["Metric"]}</td><td>{row["Value"]}</td></tr>' for _, row in shape_data.iterrows()) +
@@ -175,6 +255,13 @@ else:
         # Summary Statistics
         with st.expander("Summary Statistics"):
             st.markdown("")
+            if profile.approximate:
+                st.markdown(f'''
+                    <div class="info-box">
+                        <span class="material-icons">info</span> Approximate statistics: quartiles are within
+                        ±{profile.error_bounds["quantile_rank"]:.1%} in rank; count, mean, std, min and max are exact
+                    </div>
+                ''', unsafe_allow_html=True)
             stats = selected_profiler.get_summary_stats()
             stats = stats.round(2)
             st.markdown('<table class="styled-table"><tr>' +
@@ -202,6 +289,7 @@ else:
                                     for index, row in missing_df.iterrows()) +
                             '</table>', unsafe_allow_html=True)
 
+    stage("chart options")
     # Visualizations with All Charts
     with st.container():
         st.markdown("")
@@ -222,6 +310,9 @@ else:
         st.markdown("")
         chart_height = st.slider("Chart Height (px)", 200, 800, 400)
         st.markdown("")
+        max_points = st.number_input("Max points per chart", min_value=500, max_value=200000, value=DEFAULT_MAX_POINTS, step=500,
+                                     help="Larger datasets are binned or downsampled on the server before plotting")
+        st.markdown("")
         st.markdown("")
         # Chart selection
         st.markdown("#### Select Chart Type")
@@ -243,28 +334,43 @@ else:
             y_cols = st.multiselect("Select Y-axis columns", numeric_cols, default=[numeric_cols[0]] if numeric_cols else [])
         elif chart_type == "Bar Chart":
             selected_cols = st.multiselect("Select columns", numeric_cols, default=[numeric_cols[0]] if numeric_cols else [])
-            agg_func = st.selectbox("Aggregation", ["count", "mean", "sum"])
+            agg_func = st.selectbox("Aggregation", AGGREGATIONS)
             if agg_func != "count":
                 group_col = st.selectbox("Group by", categorical_cols)
         elif chart_type in ["Pie Chart", "Donut Chart"]:
             selected_cols = st.multiselect("Select columns", categorical_cols, default=[categorical_cols[0]] if categorical_cols else [])
         elif chart_type == "Heatmap":
-            selected_cols = st.multiselect("Select columns", numeric_cols, default=numeric_cols[:2] if len(numeric_cols) >= 2 else numeric_cols)
+            corr_method = st.selectbox("Method", CORRELATION_METHODS,
+                                       help="Cramér's V measures association between categorical columns")
+            corr_cols = selected_profiler.correlation_columns(corr_method)
+            corr_view = st.radio("Show", ["Full grid", "Strongest pairs"], horizontal=True)
+            if corr_view == "Strongest pairs":
+                selected_cols = st.multiselect("Restrict to columns (all if empty)", corr_cols, key="corr_pair_cols") or corr_cols
+                n_pairs = st.slider("Number of pairs", 5, 100, 20, step=5)
+            else:
+                selected_cols = st.multiselect("Select columns", corr_cols, default=corr_cols[:2], key=f"corr_cols_{corr_method}")
         st.markdown("")
         st.markdown("")
+        # A correlation still running for a chart no longer shown is cancelled
+        if chart_type != "Heatmap":
+            release_job("corr")
+        stage("chart")
         # Plot the selected chart
         if chart_type == "Histogram":
             for col in selected_cols:
                 st.markdown(f"**Histogram for {col}**")
-                fig = px.histogram(
-                    edited_df,
-                    x=col,
-                    nbins=30,
+                bins = histogram_data(edited_df[col], nbins=30)
+                fig = px.bar(
+                    bins,
+                    x="center",
+                    y="count",
                     title=f"Distribution of {col}",
                     color_discrete_sequence=[chart_color],
                     template="plotly_white"
                 )
+                fig.update_traces(width=bins["right"] - bins["left"])
                 fig.update_layout(
+                    bargap=0,
                     xaxis_title=col,
                     yaxis_title="Count",
                     title_x=0.5,
@@ -274,19 +380,42 @@ else:
                     width=chart_width,
                     height=chart_height
                 )
-                st.plotly_chart(fig)
+                plotly_chart(fig)
 
         elif chart_type == "Box Plot":
             for col in selected_cols:
                 st.markdown(f"**Box Plot for {col}**")
-                fig = px.box(
-                    edited_df,
-                    y=col,
-                    title=f"Box Plot of {col}",
-                    color_discrete_sequence=[chart_color],
-                    template="plotly_white"
-                )
+                box = box_data_from_profile(profile, col) if profile.approximate else box_data(edited_df[col], max_outliers=max_points)
+                if box is None:
+                    st.markdown(f'''
+                        <div class="warning-box">
+                            <span class="material-icons">warning</span> {col} has no values to plot
+                        </div>
+                    ''', unsafe_allow_html=True)
+                    continue
+                fig = go.Figure(go.Box(
+                    x=[col],
+                    q1=[box["q1"]],
+                    median=[box["median"]],
+                    q3=[box["q3"]],
+                    mean=[box["mean"]],
+                    lowerfence=[box["lowerfence"]],
+                    upperfence=[box["upperfence"]],
+                    name=col,
+                    marker_color=chart_color,
+                    boxpoints=False
+                ))
+                fig.add_trace(go.Scatter(
+                    x=[col] * len(box["outliers"]),
+                    y=box["outliers"],
+                    mode="markers",
+                    marker=dict(color=chart_color, opacity=0.6),
+                    name="Outliers"
+                ))
                 fig.update_layout(
+                    title=f"Box Plot of {col}",
+                    template="plotly_white",
+                    showlegend=False,
                     yaxis_title=col,
                     title_x=0.5,
                     plot_bgcolor="rgba(0,0,0,0)",
@@ -295,13 +424,16 @@ else:
                     width=chart_width,
                     height=chart_height
                 )
-                st.plotly_chart(fig)
+                plotly_chart(fig)
 
         elif chart_type == "Scatter":
             if y_cols:
                 st.markdown("**Scatter Plot**")
+                scatter_data = downsample_scatter(edited_df, x_col, y_cols[0], max_points=max_points)
+                if len(scatter_data) < len(edited_df):
+                    st.caption(f"Showing {len(scatter_data):,} of {len(edited_df):,} points (density-sampled)")
                 fig = px.scatter(
-                    edited_df,
+                    scatter_data,
                     x=x_col,
                     y=y_cols[0] if y_cols else None,
                     title=f"{x_col} vs {y_cols[0] if y_cols else ''}",
@@ -318,7 +450,7 @@ else:
                     width=chart_width,
                     height=chart_height
                 )
-                st.plotly_chart(fig)
+                plotly_chart(fig)
             else:
                 st.markdown(f'''
                     <div class="warning-box">
@@ -330,7 +462,16 @@ else:
             for col in selected_cols:
                 st.markdown(f"**Bar Chart for {col}**")
                 if agg_func == "count":
-                    value_counts = edited_df[col].value_counts().head(10)
+                    value_counts = selected_profiler.get_value_counts(col)
+                    if value_counts.empty:
+                        st.markdown(f'''
+                            <div class="warning-box">
+                                <span class="material-icons">warning</span> {col} has no values to plot
+                            </div>
+                        ''', unsafe_allow_html=True)
+                        continue
+                    if profile.approximate:
+                        st.caption(f"Approximate counts: each may be undercounted by up to {profile.error_bounds['top_count'][col]:,}")
                     fig = px.bar(
                         x=value_counts.values,
                         y=value_counts.index,
@@ -340,7 +481,7 @@ else:
                         template="plotly_white"
                     )
                 else:
-                    data = edited_df.groupby(group_col)[col].agg(agg_func).reset_index()
+                    data = selected_profiler.get_aggregate(group_col, col, agg_func).reset_index()
                     fig = px.bar(
                         x=data[col],
                         y=data[group_col],
@@ -359,13 +500,12 @@ else:
                     width=chart_width,
                     height=chart_height
                 )
-                st.plotly_chart(fig)
+                plotly_chart(fig)
 
         elif chart_type == "Line Chart":
             for col in selected_cols:
                 st.markdown(f"**Line Chart for {col}**")
-                line_data = edited_df[[col]].dropna()
-                line_data.index = range(len(line_data))
+                line_data = selected_profiler.get_line(col, max_points).to_frame()
                 st.line_chart(
                     line_data,
                     color=chart_color,
@@ -376,7 +516,16 @@ else:
         elif chart_type == "Pie Chart":
             for col in selected_cols:
                 st.markdown(f"**Pie Chart for {col}**")
-                value_counts = edited_df[col].value_counts().head(10)
+                value_counts = selected_profiler.get_value_counts(col)
+                if value_counts.empty:
+                    st.markdown(f'''
+                        <div class="warning-box">
+                            <span class="material-icons">warning</span> {col} has no values to plot
+                        </div>
+                    ''', unsafe_allow_html=True)
+                    continue
+                if profile.approximate:
+                    st.caption(f"Approximate counts: each may be undercounted by up to {profile.error_bounds['top_count'][col]:,}")
                 fig = px.pie(
                     names=value_counts.index,
                     values=value_counts.values,
@@ -391,13 +540,12 @@ else:
                     width=chart_width,
                     height=chart_height
                 )
-                st.plotly_chart(fig)
+                plotly_chart(fig)
 
         elif chart_type == "Area Chart":
             for col in selected_cols:
                 st.markdown(f"**Area Chart for {col}**")
-                area_data = edited_df[[col]].dropna()
-                area_data.index = range(len(area_data))
+                area_data = selected_profiler.get_line(col, max_points).to_frame()
                 st.area_chart(
                     area_data,
                     color=chart_color,
@@ -407,25 +555,36 @@ else:
 
         elif chart_type == "Heatmap":
             if len(selected_cols) >= 2:
-                st.markdown("**Correlation Heatmap**")
-                corr = edited_df[selected_cols].corr()
-                fig = px.imshow(
-                    corr,
-                    text_auto=True,
-                    color_continuous_scale="RdBu_r",
-                    zmin=-1,
-                    zmax=1,
-                    title="Correlation Heatmap"
-                )
-                fig.update_layout(
-                    title_x=0.5,
-                    plot_bgcolor="rgba(0,0,0,0)",
-                    paper_bgcolor="rgba(0,0,0,0)",
-                    font=dict(family="Manrope", size=14),
-                    width=chart_width,
-                    height=chart_height
-                )
-                st.plotly_chart(fig)
+                # The full matrix is computed once per revision; the selection is a slice of it
+                corr = await_job("corr", selected_profiler.correlation_task(corr_method), "Computing correlations")
+                if corr is not None:
+                    corr = corr.loc[selected_cols, selected_cols]
+                    if corr_view == "Strongest pairs":
+                        st.markdown(f"**Strongest {corr_method} Pairs**")
+                        pairs = top_pairs(corr, n_pairs)
+                        st.markdown('<table class="styled-table"><tr><th>Column 1</th><th>Column 2</th><th>Correlation</th></tr>' +
+                                    ''.join(f'<tr><td>{row["Column 1"]}</td><td>{row["Column 2"]}</td><td>{row["Correlation"]:.3f}</td></tr>'
+                                            for _, row in pairs.iterrows()) +
+                                    '</table>', unsafe_allow_html=True)
+                    else:
+                        st.markdown(f"**{corr_method} Correlation Heatmap**")
+                        fig = px.imshow(
+                            corr,
+                            text_auto=".2f" if len(selected_cols) <= HEATMAP_LABEL_COLUMNS else False,
+                            color_continuous_scale="RdBu_r",
+                            zmin=0 if corr_method == "Cramér's V" else -1,
+                            zmax=1,
+                            title="Correlation Heatmap"
+                        )
+                        fig.update_layout(
+                            title_x=0.5,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            font=dict(family="Manrope", size=14),
+                            width=chart_width,
+                            height=chart_height
+                        )
+                        plotly_chart(fig)
             else:
                 st.markdown(f'''
                     <div class="warning-box">
@@ -436,7 +595,16 @@ else:
         elif chart_type == "Donut Chart":
             for col in selected_cols:
                 st.markdown(f"**Donut Chart for {col}**")
-                value_counts = edited_df[col].value_counts().head(10)
+                value_counts = selected_profiler.get_value_counts(col)
+                if value_counts.empty:
+                    st.markdown(f'''
+                        <div class="warning-box">
+                            <span class="material-icons">warning</span> {col} has no values to plot
+                        </div>
+                    ''', unsafe_allow_html=True)
+                    continue
+                if profile.approximate:
+                    st.caption(f"Approximate counts: each may be undercounted by up to {profile.error_bounds['top_count'][col]:,}")
                 fig = px.pie(
                     names=value_counts.index,
                     values=value_counts.values,
@@ -452,4 +620,6 @@ else:
                     width=chart_width,
                     height=chart_height
                 )
-                st.plotly_chart(fig)
\ No newline at end of file
+                plotly_chart(fig)
+
+end_rerun()
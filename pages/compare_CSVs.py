@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
-from utils.data_utils import DataProfiler
-import time
+from utils.compare import drift_matrix, metrics_matrix, profile_datasets, schema_differences, schema_matrix
+from utils.diff import DIFF_PAGE_ROWS
+from utils.drift import PSI_THRESHOLDS
+from utils.registry import dataset_names
+from utils.metrics import stage
+from utils.widgets import UPLOAD_TYPES, await_job, end_rerun, govern_memory, ingest_new_uploads, release_job, start_rerun
 
 # Load Material Icons and Manrope font, and add custom table styling
 st.markdown("""
@@ -44,6 +48,9 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Time this run; stages are marked with stage()
+start_rerun("compare_CSVs")
+
 # Page title
 st.subheader("Compare CSVs")
 
@@ -66,44 +73,97 @@ with st.container():
         </h5>
     ''', unsafe_allow_html=True)
     st.markdown("")
-    uploaded_files = st.file_uploader("Upload CSV files to compare", type=["csv"], accept_multiple_files=True, key="compare_uploader")
-
-# Process uploaded files only if they haven't been processed before
-if uploaded_files:
-    for uploaded_file in uploaded_files:
-        if uploaded_file.name not in [name for name, _ in st.session_state.df_list]:
-            with st.spinner(f"Processing {uploaded_file.name}..."):
-                try:
-                    df = pd.read_csv(uploaded_file)
-                    profiler = DataProfiler(df)
-                    file_path = st.session_state.uploads_dir / f"{st.session_state.user}_{uploaded_file.name}"
-                    df.to_csv(file_path, index=False)
-                    st.session_state.df_list.append((uploaded_file.name, df))
-                    st.session_state.profilers.append((uploaded_file.name, profiler))
-                    st.markdown(f'''
-                        <div class="success-box">
-                            <span class="material-icons">check_circle</span> Loaded {uploaded_file.name}
-                        </div>
-                    ''', unsafe_allow_html=True)
-                    st.toast(f"Loaded {uploaded_file.name}")
-                    time.sleep(1)
-                except Exception as e:
-                    st.markdown(f'''
-                        <div class="error-box">
-                            <span class="material-icons">error</span> Error processing {uploaded_file.name}: {e}
-                        </div>
-                    ''', unsafe_allow_html=True)
-                    st.toast(f"Failed to load {uploaded_file.name}")
-                    time.sleep(1)
+    uploaded_files = st.file_uploader("Upload CSV files (plain, .gz, .bz2, .zst or zipped) to compare", type=UPLOAD_TYPES, accept_multiple_files=True, key="compare_uploader")
+
+stage("upload")
+# Ingest new uploads concurrently; files already in the session are skipped
+ingest_new_uploads(uploaded_files)
 st.markdown("")
+names = dataset_names(st.session_state.datasets)
+if len(names) >= 2:
+    mode = st.radio("Comparison mode", ["Two datasets", "Multiple datasets"], horizontal=True, key="compare_mode")
 # Check if there are enough datasets to compare
-if len(st.session_state.df_list) < 2:
+if len(names) < 2:
     st.markdown(f'''
         <div class="warning-box">
             <span class="material-icons">warning</span> Please upload at least two CSVs to compare.
         </div>
     ''', unsafe_allow_html=True)
+elif mode == "Multiple datasets":
+    stage("select")
+    # Select any number of datasets; missing profiles are computed in parallel
+    with st.container():
+        st.markdown(f'''
+            <h3>
+                <span class="material-icons">compare</span> Select Datasets to Compare
+            </h3>
+        ''', unsafe_allow_html=True)
+        st.markdown("")
+        selected_ids = st.multiselect("Select datasets", list(names), default=list(names), format_func=names.get, key="compare_ids")
+        if len(selected_ids) < 2:
+            st.markdown(f'''
+                <div class="warning-box">
+                    <span class="material-icons">warning</span> Select at least two datasets.
+                </div>
+            ''', unsafe_allow_html=True)
+        else:
+            baseline_id = st.selectbox("Baseline dataset", selected_ids, format_func=names.get, key="compare_baseline")
+            selected = [st.session_state.datasets[dataset_id] for dataset_id in selected_ids]
+            govern_memory(selected)
+            with st.spinner(f"Profiling {len(selected)} datasets..."):
+                profile_datasets(selected)
+
+            stage("metrics")
+            # Metrics Matrix
+            st.markdown("")
+            st.markdown(f'''
+                <h3>
+                    <span class="material-icons">table_chart</span> Comparison Metrics
+                </h3>
+            ''', unsafe_allow_html=True)
+            st.markdown("")
+            st.dataframe(metrics_matrix(selected), use_container_width=True,
+                         column_config={"Missing %": st.column_config.NumberColumn(format="%.2f")})
+
+            # Schema Matrix
+            st.markdown("")
+            st.markdown(f'''
+                <h3>
+                    <span class="material-icons">schema</span> Schema Differences
+                </h3>
+            ''', unsafe_allow_html=True)
+            st.markdown("")
+            schema = schema_differences(schema_matrix(selected))
+            if schema.empty:
+                st.markdown(f'''
+                    <div class="success-box">
+                        <span class="material-icons">check_circle</span> All selected datasets share the same columns and types
+                    </div>
+                ''', unsafe_allow_html=True)
+            else:
+                st.dataframe(schema.fillna("—"), use_container_width=True)
+
+            stage("drift")
+            # Drift Matrix
+            st.markdown("")
+            st.markdown(f'''
+                <h3>
+                    <span class="material-icons">query_stats</span> Distribution Drift
+                </h3>
+            ''', unsafe_allow_html=True)
+            st.markdown("")
+            metric = st.selectbox("Drift metric", ["PSI", "JS Distance", "KS"], key="compare_metric")
+            drift = drift_matrix(st.session_state.datasets[baseline_id], selected, metric)
+            st.markdown(f'''
+                <div class="info-box">
+                    <span class="material-icons">info</span> {metric} of each dataset's columns against {names[baseline_id]}.
+                    PSI below {PSI_THRESHOLDS[0]} is stable, below {PSI_THRESHOLDS[1]} moderate, and major above.
+                </div>
+            ''', unsafe_allow_html=True)
+            st.markdown("")
+            st.dataframe(drift.round(3), use_container_width=True)
 else:
+    stage("select")
     # Select two datasets to compare
     with st.container():
         st.markdown(f'''
@@ -112,19 +172,24 @@ else:
             </h3>
         ''', unsafe_allow_html=True)
         st.markdown("")
-        file_options = [name for name, _ in st.session_state.df_list]
-        file1 = st.selectbox("Select first dataset", file_options, key="file1")
-        file2_options = [name for name in file_options if name != file1]
+        id1 = st.selectbox("Select first dataset", list(names), format_func=names.get, key="file1")
+        file2_options = [dataset_id for dataset_id in names if dataset_id != id1]
         st.markdown("")
         if file2_options:
-            file2 = st.selectbox("Select second dataset", file2_options, key="file2")
+            id2 = st.selectbox("Select second dataset", file2_options, format_func=names.get, key="file2")
         else:
-            file2 = None
+            id2 = None
 
-        if file1 and file2:
-            df1 = next(df for name, df in st.session_state.df_list if name == file1)
-            df2 = next(df for name, df in st.session_state.df_list if name == file2)
+        if id1 and id2:
+            dataset1, dataset2 = st.session_state.datasets[id1], st.session_state.datasets[id2]
+            govern_memory([dataset1, dataset2])
+            file1, file2 = dataset1.name, dataset2.name
+            df1, df2 = dataset1.df, dataset2.df
+            profiler1, profiler2 = dataset1.profiler, dataset2.profiler
+            profile1 = profiler1.profile
+            profile2 = profiler2.profile
 
+            stage("metrics")
             # Comparison Metrics
             with st.container():
                 st.markdown("")
@@ -137,8 +202,8 @@ else:
                 st.markdown("")
                 metrics_data = pd.DataFrame({
                     "Metric": ["Rows", "Columns", "Missing Values", "Common Columns"],
-                    file1: [len(df1), len(df1.columns), df1.isnull().sum().sum(), len(set(df1.columns) & set(df2.columns))],
-                    file2: [len(df2), len(df2.columns), df2.isnull().sum().sum(), len(set(df1.columns) & set(df2.columns))]
+                    file1: [profile1.n_rows, profile1.n_cols, profile1.total_missing, len(set(df1.columns) & set(df2.columns))],
+                    file2: [profile2.n_rows, profile2.n_cols, profile2.total_missing, len(set(df1.columns) & set(df2.columns))]
                 })
                 st.markdown('<table class="styled-table"><tr><th>Metric</th><th>{}</th><th>{}</th></tr>'.format(file1, file2) +
                             ''.join(f'<tr><td>{row["Metric"]}</td><td>{row[file1]}</td><td>{row[file2]}</td></tr>'
@@ -146,6 +211,41 @@ else:
                             '</table>', unsafe_allow_html=True)
                 st.markdown("")
 
+            stage("drift")
+            # Distribution Drift
+            with st.container():
+                st.markdown("")
+                st.markdown(f'''
+                    <h3>
+                        <span class="material-icons">query_stats</span> Distribution Drift
+                    </h3>
+                ''', unsafe_allow_html=True)
+                st.markdown("")
+                drift = profiler1.get_drift(profiler2)
+                if drift.empty:
+                    st.markdown(f'''
+                        <div class="info-box">
+                            <span class="material-icons">info</span> No shared columns with comparable types
+                        </div>
+                    ''', unsafe_allow_html=True)
+                else:
+                    st.markdown(f'''
+                        <div class="info-box">
+                            <span class="material-icons">info</span> {file2} compared against {file1} as the baseline, from the cached profiles.
+                            PSI below {PSI_THRESHOLDS[0]} is stable, below {PSI_THRESHOLDS[1]} moderate, and major above.
+                        </div>
+                    ''', unsafe_allow_html=True)
+                    st.markdown("")
+                    st.markdown('<table class="styled-table"><tr>' + ''.join(f'<th>{col}</th>' for col in drift.columns) + '</tr>' +
+                                ''.join('<tr>' + ''.join(f'<td>{value:.3f}</td>' if isinstance(value, float) and not pd.isna(value)
+                                                         else f'<td>{"" if pd.isna(value) else value}</td>' for value in row) + '</tr>'
+                                        for row in drift.itertuples(index=False)) +
+                                '</table>', unsafe_allow_html=True)
+                    if profile1.approximate or profile2.approximate:
+                        st.caption("Approximate profiles: numeric drift is estimated from KLL sketches and category shifts from the tracked frequent values.")
+                st.markdown("")
+
+            stage("preview")
             # Display the datasets
             with st.container():
                 st.markdown("")
@@ -161,4 +261,71 @@ else:
                     st.dataframe(df1.head(), use_container_width=True)
                 with col2:
                     st.markdown(f"**{file2}**")
-                    st.dataframe(df2.head(), use_container_width=True)
\ No newline at end of file
+                    st.dataframe(df2.head(), use_container_width=True)
+
+            stage("diff")
+            # Row Differences
+            with st.container():
+                st.markdown("")
+                st.markdown("")
+                st.markdown(f'''
+                    <h3>
+                        <span class="material-icons">difference</span> Row Differences
+                    </h3>
+                ''', unsafe_allow_html=True)
+                st.markdown("")
+                common_columns = [col for col in df1.columns if col in df2.columns]
+                keys = st.multiselect("Key columns", common_columns, key="diff_keys",
+                                      help="Rows of the two datasets with the same values in these columns are compared with each other.")
+                diff = None
+                if not keys:
+                    release_job("diff")
+                    st.markdown(f'''
+                        <div class="info-box">
+                            <span class="material-icons">info</span> Select one or more key columns to match rows between {file1} and {file2}.
+                        </div>
+                    ''', unsafe_allow_html=True)
+                else:
+                    diff = await_job("diff", profiler1.diff_task(profiler2, keys), "Comparing rows")
+                if diff is not None:
+                    diff_data = pd.DataFrame({
+                        "Metric": [f"Removed (only in {file1})", f"Added (only in {file2})", "Changed", "Unchanged"],
+                        "Rows": [len(diff.removed), len(diff.added), diff.n_changed, diff.n_unchanged]
+                    })
+                    st.markdown('<table class="styled-table"><tr><th>Metric</th><th>Rows</th></tr>' +
+                                ''.join(f'<tr><td>{row["Metric"]}</td><td>{row["Rows"]:,}</td></tr>'
+                                        for _, row in diff_data.iterrows()) +
+                                '</table>', unsafe_allow_html=True)
+                    if diff.duplicates1 or diff.duplicates2:
+                        st.markdown(f'''
+                            <div class="warning-box">
+                                <span class="material-icons">warning</span> The key is not unique ({diff.duplicates1:,} repeated in {file1}, {diff.duplicates2:,} in {file2}); only the first row of each key is compared.
+                            </div>
+                        ''', unsafe_allow_html=True)
+                    st.markdown("")
+                    column_changes = diff.column_changes()
+                    if len(column_changes):
+                        st.markdown('<table class="styled-table"><tr><th>Column</th><th>Changed Rows</th></tr>' +
+                                    ''.join(f'<tr><td>{col}</td><td>{count:,}</td></tr>'
+                                            for col, count in column_changes.items()) +
+                                    '</table>', unsafe_allow_html=True)
+                        st.markdown("")
+
+                    # Detail is rendered one page at a time
+                    detail_col, page_col = st.columns(2)
+                    with detail_col:
+                        detail = st.selectbox("Show", ["Changed cells", "Removed rows", "Added rows"], key="diff_detail")
+                    total = {"Changed cells": diff.n_changed, "Removed rows": len(diff.removed), "Added rows": len(diff.added)}[detail]
+                    n_pages = max((total + DIFF_PAGE_ROWS - 1) // DIFF_PAGE_ROWS, 1)
+                    if st.session_state.get("diff_page", 1) > n_pages:
+                        st.session_state["diff_page"] = n_pages
+                    with page_col:
+                        page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1, step=1, key="diff_page")
+                    if detail == "Changed cells":
+                        st.dataframe(diff.changed_cells(df1, df2, page), use_container_width=True, hide_index=True)
+                    elif detail == "Removed rows":
+                        st.dataframe(diff.removed_rows(df1, page), use_container_width=True)
+                    else:
+                        st.dataframe(diff.added_rows(df2, page), use_container_width=True)
+
+end_rerun()
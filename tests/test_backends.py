@@ -0,0 +1,97 @@
+"""Every installed compute backend must return the pandas backend's results."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.aggregation import AGGREGATIONS
+from utils.backends import EngineBackend, get_backend, installed_backends
+from utils.dtypes import is_categorical, is_numeric, optimize_dtypes
+
+# Relative tolerance for floating point results, which engines sum in a different order
+RTOL = 1e-9
+# Absolute tolerance for correlations, which are near zero for independent columns
+ATOL = 1e-12
+
+ENGINES = [name for name in installed_backends() if name != "pandas"]
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    df = pd.DataFrame({
+        "id": np.arange(n),
+        "small": rng.integers(0, 10, n),
+        "value": rng.normal(size=n),
+        "sparse": np.where(rng.random(n) < 0.2, np.nan, rng.exponential(size=n)),
+        "city": rng.choice(["Oslo", "Lima", "Pune", "Nice"], n),
+        # Missing values in a string column exercise the null handling of every engine
+        "code": np.where(np.arange(n) % 7 == 0, None, rng.choice(["a", "b", "c"], n)).astype(object),
+        "label": [f"item {i % 3001}" for i in range(n)],
+    })
+    optimize_dtypes(df)
+    return df
+
+
+def _numeric(df):
+    return [col for col in df.columns if is_numeric(df.dtypes[col])]
+
+
+def _categorical(df):
+    return [col for col in df.columns if is_categorical(df.dtypes[col])]
+
+
+def _assert_same(actual, expected):
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=RTOL, atol=ATOL)
+    else:
+        pd.testing.assert_series_equal(actual, expected, check_exact=False, rtol=RTOL, atol=ATOL, check_names=False)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_profile_matches_pandas(df, engine):
+    expected, actual = get_backend("pandas").profile(df), get_backend(engine).profile(df)
+    _assert_same(actual.numeric_stats, expected.numeric_stats)
+    _assert_same(actual.null_counts, expected.null_counts)
+    _assert_same(actual.distinct_counts, expected.distinct_counts)
+    for col in expected.columns:
+        _assert_same(actual.top_values[col], expected.top_values[col])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("agg", AGGREGATIONS)
+def test_group_cube_matches_pandas(df, engine, agg):
+    numeric = _numeric(df)
+    for col in _categorical(df):
+        expected = get_backend("pandas").group_cube(df, col, numeric)
+        actual = get_backend(engine).group_cube(df, col, numeric)
+        for value_col in numeric:
+            _assert_same(actual.aggregate(value_col, agg), expected.aggregate(value_col, agg))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("method", ["Pearson", "Spearman"])
+def test_correlation_matches_pandas(df, engine, method):
+    numeric = _numeric(df)
+    _assert_same(get_backend(engine).correlation(df, numeric, method),
+                 get_backend("pandas").correlation(df, numeric, method))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_diff_matches_pandas(df, engine):
+    other = df.sample(frac=0.9, random_state=1).sort_index()
+    other.loc[other.index[::50], "value"] += 1
+    expected = get_backend("pandas").diff(df, other, ["id"])
+    actual = get_backend(engine).diff(df, other, ["id"])
+    for name in ["removed", "added", "changed1", "changed2", "changed_mask"]:
+        np.testing.assert_array_equal(getattr(actual, name), getattr(expected, name))
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_backend("spark")
+
+
+def test_engine_backends_must_count_values():
+    with pytest.raises(TypeError):
+        type("Incomplete", (EngineBackend,), {})()
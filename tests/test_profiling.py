@@ -0,0 +1,61 @@
+"""Profiles updated from editor deltas must equal a full rebuild of the edited frame."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_utils import DataProfiler
+from utils.profiling import build_profile
+
+# Relative tolerance for moments, which the update adjusts instead of recomputing
+RTOL = 1e-9
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 2_000
+    return pd.DataFrame({
+        "count": rng.integers(0, 20, n),
+        "value": np.where(rng.random(n) < 0.1, np.nan, rng.normal(size=n)),
+        "city": rng.choice(["Oslo", "Lima", "Pune", None], n).astype(object),
+        "grade": pd.Categorical(rng.choice(["a", "b", "c"], n)),
+    })
+
+
+def _edit(df, edited_rows=None, added_rows=None, deleted_rows=None):
+    """Returns the frame and widget state st.data_editor would return for these changes."""
+    edited_rows, added_rows, deleted_rows = edited_rows or {}, added_rows or [], deleted_rows or []
+    edited = df.drop(index=df.index[deleted_rows])
+    for pos, cells in edited_rows.items():
+        for col, value in cells.items():
+            edited.loc[df.index[pos], col] = value
+    if added_rows:
+        added = pd.DataFrame(added_rows, index=range(len(df), len(df) + len(added_rows))).astype(df.dtypes)
+        edited = pd.concat([edited, added])
+    state = {"edited_rows": edited_rows, "added_rows": added_rows, "deleted_rows": deleted_rows}
+    return edited, state
+
+
+def _assert_same_profile(actual, expected):
+    assert actual.n_rows == expected.n_rows
+    pd.testing.assert_series_equal(actual.null_counts, expected.null_counts, check_names=False)
+    pd.testing.assert_series_equal(actual.distinct_counts, expected.distinct_counts, check_names=False)
+    pd.testing.assert_frame_equal(actual.numeric_stats, expected.numeric_stats, check_exact=False, rtol=RTOL)
+    for col in expected.columns:
+        pd.testing.assert_series_equal(actual.top_values[col], expected.top_values[col], check_names=False)
+
+
+@pytest.mark.parametrize("changes", [
+    {"edited_rows": {3: {"count": 99, "city": "Nice"}, 10: {"value": None}}},
+    {"added_rows": [{"count": 5, "value": 1.5, "city": "Oslo", "grade": "b"}]},
+    {"deleted_rows": [0, 7, 1_999]},
+    {"edited_rows": {6: {"value": 2.5}}, "added_rows": [{"count": 1, "value": None, "city": None, "grade": "a"}],
+     "deleted_rows": [4, 5]},
+], ids=["edit", "add", "delete", "mixed"])
+def test_update_matches_rebuild(df, changes):
+    profiler = DataProfiler(df)
+    edited, state = _edit(df, **changes)
+    updated = profiler.apply_edits(edited, state)
+    # The profile must come from the delta, not from the fallback that re-profiles the frame
+    assert updated.cached_profile() is not None
+    _assert_same_profile(updated.profile, build_profile(edited))
@@ -0,0 +1,31 @@
+# Headless API: everything below runs without Streamlit (see also `python -m utils`)
+from utils.aggregation import AGGREGATIONS, GroupCube, group_cube
+from utils.api import compare_files, compare_report, load_dataset, profile_file, profile_files, profile_report
+from utils.backends import BACKENDS, get_backend, installed_backends, select_backend
+from utils.cache import ProfileCache, fingerprint, profile_cache
+from utils.chart_utils import box_data, box_data_from_profile, downsample_line, downsample_scatter, histogram_data
+from utils.compare import drift_matrix, metrics_matrix, profile_datasets, schema_differences, schema_matrix
+from utils.correlation import CORRELATION_METHODS, correlation_matrix, top_pairs
+from utils.csv_reader import COLUMN_TYPES, CSVParseError, CSVSource, ParseStats, csv_sources
+from utils.data_utils import DataProfiler
+from utils.diff import RowDiff, diff_frames
+from utils.drift import drift_report
+from utils.dtypes import optimize_dtypes
+from utils.export import EXPORT_FORMATS, export_bytes
+from utils.ingest import read_csv_chunked
+from utils.profiling import Profile, build_profile
+from utils.registry import Dataset, add_dataset, dataset_id, dataset_names
+from utils.sketches import build_approximate_profile
+from utils.storage import read_dataset, write_dataset
+
+__all__ = [
+    "AGGREGATIONS", "BACKENDS", "COLUMN_TYPES", "CORRELATION_METHODS", "EXPORT_FORMATS",
+    "CSVParseError", "CSVSource", "DataProfiler", "Dataset", "GroupCube", "ParseStats", "Profile", "ProfileCache", "RowDiff",
+    "add_dataset", "box_data", "box_data_from_profile", "build_approximate_profile", "build_profile",
+    "compare_files", "compare_report", "correlation_matrix", "csv_sources", "dataset_id", "dataset_names",
+    "diff_frames", "downsample_line", "downsample_scatter", "drift_matrix", "drift_report",
+    "export_bytes", "fingerprint", "get_backend", "group_cube", "histogram_data", "installed_backends", "load_dataset", "metrics_matrix",
+    "optimize_dtypes", "profile_cache", "profile_datasets", "profile_file", "profile_files",
+    "profile_report", "read_csv_chunked", "read_dataset", "schema_differences", "schema_matrix", "select_backend",
+    "top_pairs", "write_dataset",
+]
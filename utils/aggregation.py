@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Aggregations offered by the bar chart; count shows a column's most frequent values
+AGGREGATIONS = ["count", "mean", "sum", "min", "max"]
+
+
+class GroupCube:
+    """Per-group count, sum, min and max of every numeric column for one group-by column.
+
+    Built once with a single factorize of the group column and one vectorised pass per
+    statistic, so any aggregation of any value column is read off in O(groups).
+    """
+
+    def __init__(self, group_col, groups, columns, counts, sums, mins, maxs):
+        self.group_col = group_col
+        self.groups = groups
+        self.columns = list(columns)
+        self.counts = counts
+        self.sums = sums
+        self.mins = mins
+        self.maxs = maxs
+
+    def aggregate(self, col, agg):
+        """Returns one aggregation of a value column per group, like
+        df.groupby(group_col, observed=True)[col].agg(agg)."""
+        j = self.columns.index(col)
+        counts = self.counts[:, j]
+        if agg == "count":
+            values = counts
+        elif agg == "sum":
+            values = self.sums[:, j]
+        elif agg == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = self.sums[:, j] / counts
+        elif agg in ("min", "max"):
+            values = np.where(counts > 0, (self.mins if agg == "min" else self.maxs)[:, j], np.nan)
+        else:
+            raise ValueError(f"Unknown aggregation: {agg}")
+        return pd.Series(values, index=self.groups, name=col)
+
+
+def group_cube(df, group_col, value_cols):
+    """Returns the GroupCube of value_cols grouped by group_col. Rows whose group is
+    missing are left out and groups are sorted, as in DataFrame.groupby()."""
+    codes, uniques = pd.factorize(df[group_col], sort=True, use_na_sentinel=True)
+    valid = codes >= 0
+    codes = codes[valid]
+    n_groups = len(uniques)
+    shape = (n_groups, len(value_cols))
+    counts = np.zeros(shape, dtype="int64")
+    sums = np.zeros(shape)
+    mins = np.full(shape, np.inf)
+    maxs = np.full(shape, -np.inf)
+    for j, col in enumerate(value_cols):
+        values = df[col].to_numpy(dtype="float64", na_value=np.nan)[valid]
+        present = ~np.isnan(values)
+        counts[:, j] = np.bincount(codes[present], minlength=n_groups)
+        sums[:, j] = np.bincount(codes[present], weights=values[present], minlength=n_groups)
+        np.minimum.at(mins[:, j], codes[present], values[present])
+        np.maximum.at(maxs[:, j], codes[present], values[present])
+    groups = pd.Index(uniques, name=group_col)
+    return GroupCube(group_col, groups, value_cols, counts, sums, mins, maxs)
@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from utils.compare import PROFILE_WORKERS, metrics_matrix, schema_differences, schema_matrix
+from utils.csv_reader import csv_sources
+from utils.data_utils import DataProfiler
+from utils.ingest import read_csv_chunked
+from utils.profiling import json_value
+from utils.registry import Dataset
+
+
+def load_dataset(path, name=None, approximate=None):
+    """Parses and profiles a CSV file or CSVSource in chunks. Returns a registry Dataset
+    whose profiler already holds the profile. `approximate` as in read_csv_chunked."""
+    df, profile = read_csv_chunked(path, approximate=approximate)
+    return Dataset(name or Path(str(path)).name, DataProfiler(df, profile=profile))
+
+
+def profile_report(dataset):
+    """Returns the JSON-serialisable profile report of a dataset."""
+    return {"name": dataset.name, **dataset.profiler.profile.to_dict()}
+
+
+def profile_file(path, approximate=None, name=None):
+    """Returns the profile report of a CSV file or CSVSource."""
+    return profile_report(load_dataset(path, name, approximate))
+
+
+def profile_files(paths, approximate=None, workers=PROFILE_WORKERS):
+    """Profiles many CSV files on a process pool, each CSV in a zip archive separately.
+    Yields (path, report, error) as each CSV finishes, where path has the member name
+    appended for archives and error is the exception raised for that CSV, if any."""
+    sources = {}
+    for path in paths:
+        try:
+            for name, source in csv_sources(path, Path(path).name):
+                sources[str(path) if source.member is None else f"{path}/{source.member}"] = (source, name)
+        except Exception as e:
+            yield path, None, e
+    with ProcessPoolExecutor(max(min(workers, len(sources)), 1)) as pool:
+        futures = {pool.submit(profile_file, source, approximate, name): path for path, (source, name) in sources.items()}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def compare_report(baseline, current, keys=None):
+    """Returns a JSON-serialisable comparison of two datasets: their metrics, the columns
+    whose dtype or presence differs, per-column drift and, given key columns, a summary of
+    the keyed row differences."""
+    datasets = [baseline, current]
+    schema = schema_differences(schema_matrix(datasets))
+    report = {
+        "metrics": {name: {metric: json_value(value) for metric, value in row.items()}
+                    for name, row in metrics_matrix(datasets).to_dict(orient="index").items()},
+        "schema_differences": {str(col): {name: json_value(dtype) for name, dtype in row.items()}
+                               for col, row in schema.iterrows()},
+        "drift": [{field: json_value(value) for field, value in row.items()}
+                  for row in baseline.profiler.get_drift(current.profiler).to_dict(orient="records")],
+    }
+    if keys:
+        diff = baseline.profiler.get_diff(current.profiler, keys)
+        report["row_diff"] = {
+            "keys": list(keys),
+            "removed": len(diff.removed),
+            "added": len(diff.added),
+            "changed": diff.n_changed,
+            "unchanged": int(diff.n_unchanged),
+            "column_changes": {str(col): int(count) for col, count in diff.column_changes().items()},
+        }
+    return report
+
+
+def compare_files(baseline_path, current_path, keys=None, approximate=None):
+    """Returns the comparison report of two CSV files."""
+    return compare_report(load_dataset(baseline_path, approximate=approximate),
+                          load_dataset(current_path, approximate=approximate), keys)
@@ -0,0 +1,308 @@
+import abc
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils.aggregation import GroupCube, group_cube
+from utils.correlation import correlation_matrix, pearson, rank_frame
+from utils.diff import diff_frames
+from utils.dtypes import is_categorical, is_numeric
+from utils.profiling import BLOCK_SIZE, ProfileBuilder, build_profile, table_part
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Compute engines; Polars and DuckDB are optional and only offered when installed
+BACKENDS = ["pandas", "polars", "duckdb"]
+# Engine profiling, aggregation and correlation run on: one of BACKENDS or "auto", set with EDA_BACKEND
+DEFAULT_BACKEND = os.environ.get("EDA_BACKEND", "auto")
+# In auto mode, datasets of at least this many rows run on the first installed engine of
+# AUTO_BACKENDS and smaller ones on pandas, set with EDA_BACKEND_ROWS
+AUTO_BACKEND_ROWS = int(os.environ.get("EDA_BACKEND_ROWS", 1_000_000))
+AUTO_BACKENDS = ["polars", "duckdb"]
+
+
+def _float_values(df, col):
+    return df[col].to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _group_index(keys, dtype, name):
+    """Returns group keys read back from an engine as an index of the group column's dtype."""
+    return pd.Index(pd.array(keys, dtype=dtype), name=name)
+
+
+def _sorted_cube(group_col, keys, dtype, value_cols, counts, sums, mins, maxs):
+    """Returns a GroupCube with its groups sorted as DataFrame.groupby() sorts them."""
+    groups = _group_index(keys, dtype, group_col)
+    order = groups.argsort()
+    counts, sums = counts[order].astype("int64"), np.nan_to_num(sums[order])
+    return GroupCube(group_col, groups[order], value_cols, counts, sums, mins[order], maxs[order])
+
+
+def _diagonal(stds):
+    """Returns the diagonal of a correlation matrix: 1 for columns that vary, else NaN."""
+    return np.where(np.nan_to_num(stds) > 0, 1.0, np.nan)
+
+
+class PandasBackend:
+    """Eager pandas and NumPy: the reference results every other backend must match.
+    Engines subclass it and fall back to it for anything they cannot run."""
+
+    name = "pandas"
+
+    def profile(self, df, chunk_rows=None, progress=None):
+        """Returns the exact Profile of a frame."""
+        return build_profile(df, chunk_rows=chunk_rows, progress=progress)
+
+    def group_cube(self, df, group_col, value_cols):
+        """Returns the GroupCube of value_cols grouped by group_col."""
+        return group_cube(df, group_col, value_cols)
+
+    def pearson(self, df, cols, progress=None):
+        return pearson(df, cols, progress)
+
+    def ranks(self, df, cols):
+        return rank_frame(df, cols)
+
+    def correlation(self, df, cols, method="Pearson", progress=None):
+        """Returns the correlation matrix of `cols` for one of CORRELATION_METHODS."""
+        if method == "Pearson":
+            return self.pearson(df, cols, progress)
+        if method == "Spearman":
+            return self.pearson(self.ranks(df, cols), cols, progress)
+        return correlation_matrix(df, cols, method, progress)
+
+    def diff(self, df1, df2, keys, progress=None):
+        """Returns the keyed RowDiff of two frames."""
+        return diff_frames(df1, df2, keys, progress)
+
+
+class EngineBackend(PandasBackend, metaclass=abc.ABCMeta):
+    """A backend that profiles by computing every column's value table in an engine; the
+    statistics are then derived from the tables exactly as the pandas profile derives them.
+    Keyed diffs run on the pandas implementation, which returns row positions into the frames."""
+
+    def profile(self, df, chunk_rows=None, progress=None):
+        # The engine scans whole columns itself, so the frame is not chunked
+        return ProfileBuilder().add(df, parts=self.profile_parts(df, progress)).result(df)
+
+    def profile_parts(self, df, progress=None):
+        """Returns {column: ("numeric" | "categorical", partial)} for the columns the
+        engine can read; the rest are profiled by pandas."""
+        numeric = [col for col in df.columns if is_numeric(df.dtypes[col])]
+        strings = [col for col in df.columns if is_categorical(df.dtypes[col])]
+        columns = numeric + strings
+        parts = {}
+        for start in range(0, len(columns), BLOCK_SIZE):
+            if progress:
+                progress(start / max(len(columns), 1))
+            block = columns[start:start + BLOCK_SIZE]
+            parts.update(self.value_tables(df, [col for col in block if col in numeric],
+                                           [col for col in block if col in strings]))
+        return parts
+
+    @abc.abstractmethod
+    def value_tables(self, df, numeric, strings):
+        """Returns {column: ("numeric" | "categorical", partial)} for the given numeric and
+        string columns, counting their values in the engine."""
+
+
+class PolarsBackend(EngineBackend):
+    """Polars: columns are queried lazily and collected together on its thread pool."""
+
+    name = "polars"
+
+    @staticmethod
+    def _series(df, col):
+        """Returns a column as a Polars series, or None if Polars cannot convert it."""
+        try:
+            return pl.from_pandas(df[col])
+        except (TypeError, ValueError, pl.exceptions.PolarsError):
+            return None
+
+    def value_tables(self, df, numeric, strings):
+        queries, kinds, nulls = [], [], []
+        for col in numeric:
+            series = pl.Series("v", _float_values(df, col), nan_to_null=True)
+            queries.append(series.to_frame().lazy().drop_nulls().group_by("v").agg(pl.len().alias("n")).sort("v"))
+            kinds.append((col, "numeric"))
+            nulls.append(series.null_count())
+        for col in strings:
+            series = self._series(df, col)
+            if series is None:
+                continue
+            # First-occurrence order, so ties among the most frequent values match pandas
+            queries.append(series.alias("v").to_frame().lazy().drop_nulls()
+                           .group_by("v", maintain_order=True).agg(pl.len().alias("n")))
+            kinds.append((col, "categorical"))
+            nulls.append(series.null_count())
+        parts = {}
+        for (col, kind), null_count, table in zip(kinds, nulls, pl.collect_all(queries)):
+            counts = table["n"].to_numpy().astype("int64")
+            if kind == "numeric":
+                parts[col] = ("numeric", table_part(table["v"].to_numpy(), counts, null_count))
+            else:
+                values = pd.Index(np.asarray(table["v"].to_list(), dtype=object), dtype=object)
+                parts[col] = ("categorical", {"null": null_count, "value_counts": pd.Series(counts, index=values)})
+        return parts
+
+    def group_cube(self, df, group_col, value_cols):
+        keys = self._series(df, group_col)
+        if keys is None:
+            return super().group_cube(df, group_col, value_cols)
+        frame = pl.DataFrame([keys.alias("g")] + [pl.Series(f"c{j}", _float_values(df, col), nan_to_null=True)
+                                                  for j, col in enumerate(value_cols)])
+        aggs = []
+        for j in range(len(value_cols)):
+            value = pl.col(f"c{j}")
+            aggs += [value.count().alias(f"count{j}"), value.sum().alias(f"sum{j}"),
+                     value.min().alias(f"min{j}"), value.max().alias(f"max{j}")]
+        out = frame.lazy().drop_nulls("g").group_by("g").agg(aggs).collect()
+
+        def stat(name):
+            columns = [out[f"{name}{j}"].cast(pl.Float64).fill_null(np.nan).to_numpy() for j in range(len(value_cols))]
+            return np.column_stack(columns) if columns else np.zeros((len(out), 0))
+
+        try:
+            return _sorted_cube(group_col, out["g"].to_list(), df.dtypes[group_col], value_cols,
+                                stat("count"), stat("sum"), stat("min"), stat("max"))
+        except TypeError:
+            # Keys of mixed types only sort the way pandas sorts them in pandas
+            return super().group_cube(df, group_col, value_cols)
+
+    def pearson(self, df, cols, progress=None):
+        if progress:
+            progress(0.0)
+        frame = pl.DataFrame([pl.Series(f"c{j}", _float_values(df, col), nan_to_null=True) for j, col in enumerate(cols)])
+        exprs = [pl.col(f"c{j}").std().alias(f"std{j}") for j in range(len(cols))]
+        pairs = [(i, j) for i in range(len(cols)) for j in range(i + 1, len(cols))]
+        for i, j in pairs:
+            # Rows where both columns are present, as DataFrame.corr() pairs them
+            a, b = pl.col(f"c{i}"), pl.col(f"c{j}")
+            both = a.is_not_null() & b.is_not_null()
+            exprs.append(pl.corr(a.filter(both), b.filter(both)).alias(f"{i}_{j}"))
+        row = frame.select(exprs).row(0, named=True) if cols else {}
+        corr = np.diag(_diagonal(np.array([row[f"std{j}"] for j in range(len(cols))], dtype="float64")))
+        for i, j in pairs:
+            corr[i, j] = corr[j, i] = np.nan if row[f"{i}_{j}"] is None else row[f"{i}_{j}"]
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=cols, columns=cols)
+
+    def ranks(self, df, cols):
+        frame = pl.DataFrame([pl.Series(f"c{j}", _float_values(df, col), nan_to_null=True) for j, col in enumerate(cols)])
+        ranks = frame.select([pl.col(f"c{j}").rank("average") for j in range(len(cols))])
+        return pd.DataFrame({col: ranks[f"c{j}"].cast(pl.Float64).fill_null(np.nan).to_numpy()
+                             for j, col in enumerate(cols)}, index=df.index)
+
+
+class DuckDBBackend(EngineBackend):
+    """Embedded DuckDB: each query runs over Arrow tables on DuckDB's thread pool."""
+
+    name = "duckdb"
+
+    @staticmethod
+    def _table(df, col, name):
+        """Returns a column as a one-column Arrow table, or None if Arrow cannot convert it."""
+        try:
+            return pa.Table.from_pandas(df[[col]].set_axis([name], axis=1), preserve_index=False)
+        except (TypeError, ValueError):
+            return None
+
+    def value_tables(self, df, numeric, strings):
+        parts = {}
+        with duckdb.connect() as con:
+            for col in numeric:
+                values = pa.array(_float_values(df, col), from_pandas=True)
+                con.register("t", pa.table({"v": values}))
+                table = con.execute("SELECT v, count(*) AS n FROM t WHERE v IS NOT NULL GROUP BY v ORDER BY v").df()
+                con.unregister("t")
+                parts[col] = ("numeric", table_part(table["v"].to_numpy(dtype="float64"),
+                                                    table["n"].to_numpy(dtype="int64"), values.null_count))
+            for col in strings:
+                table = self._table(df, col, "v")
+                if table is None:
+                    continue
+                # First-occurrence order, so ties among the most frequent values match pandas
+                con.register("t", table.append_column("i", pa.array(np.arange(len(df)))))
+                out = con.execute("SELECT v, count(*) AS n FROM t WHERE v IS NOT NULL GROUP BY v ORDER BY min(i)").df()
+                con.unregister("t")
+                values = pd.Index(np.asarray(out["v"].tolist(), dtype=object), dtype=object)
+                parts[col] = ("categorical", {"null": table.column("v").null_count,
+                                              "value_counts": pd.Series(out["n"].to_numpy(dtype="int64"), index=values)})
+        return parts
+
+    def group_cube(self, df, group_col, value_cols):
+        table = self._table(df, group_col, "g")
+        if table is None:
+            return super().group_cube(df, group_col, value_cols)
+        for j, col in enumerate(value_cols):
+            table = table.append_column(f"c{j}", pa.array(_float_values(df, col), from_pandas=True))
+        aggs = "".join(f", count(c{j}), sum(c{j}), min(c{j}), max(c{j})" for j in range(len(value_cols)))
+        with duckdb.connect() as con:
+            con.register("t", table)
+            out = con.execute(f"SELECT g{aggs} FROM t WHERE g IS NOT NULL GROUP BY g").df()
+        values = out.iloc[:, 1:].to_numpy(dtype="float64", na_value=np.nan).reshape(len(out), len(value_cols), 4)
+        try:
+            return _sorted_cube(group_col, out["g"].tolist(), df.dtypes[group_col], value_cols,
+                                values[:, :, 0], values[:, :, 1], values[:, :, 2], values[:, :, 3])
+        except TypeError:
+            return super().group_cube(df, group_col, value_cols)
+
+    def pearson(self, df, cols, progress=None):
+        if progress:
+            progress(0.0)
+        if not cols:
+            return pd.DataFrame(index=cols, columns=cols, dtype="float64")
+        table = pa.table({f"c{j}": pa.array(_float_values(df, col), from_pandas=True) for j, col in enumerate(cols)})
+        pairs = [(i, j) for i in range(len(cols)) for j in range(i + 1, len(cols))]
+        # corr() skips rows where either column is NULL, as DataFrame.corr() pairs them
+        exprs = [f"stddev_samp(c{j})" for j in range(len(cols))] + [f"corr(c{i}, c{j})" for i, j in pairs]
+        with duckdb.connect() as con:
+            con.register("t", table)
+            row = con.execute(f"SELECT {', '.join(exprs)} FROM t").df().iloc[0].to_numpy(dtype="float64", na_value=np.nan)
+        corr = np.diag(_diagonal(row[:len(cols)]))
+        for (i, j), value in zip(pairs, row[len(cols):]):
+            corr[i, j] = corr[j, i] = value
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=cols, columns=cols)
+
+
+_BACKEND_TYPES = {"pandas": PandasBackend, "polars": PolarsBackend, "duckdb": DuckDBBackend}
+_MODULES = {"pandas": pd, "polars": pl, "duckdb": duckdb}
+_instances = {}
+
+
+def installed_backends():
+    """Returns the names of the backends whose engine is installed."""
+    return [name for name in BACKENDS if _MODULES[name] is not None]
+
+
+def get_backend(name):
+    """Returns the backend called `name`; raises ValueError if it is unknown or not installed."""
+    if name not in _BACKEND_TYPES:
+        raise ValueError(f"Unknown compute backend: {name} (expected one of {', '.join(BACKENDS)} or auto)")
+    if _MODULES[name] is None:
+        raise ValueError(f"The {name} backend needs the {name} package: pip install {name}")
+    if name not in _instances:
+        _instances[name] = _BACKEND_TYPES[name]()
+    return _instances[name]
+
+
+def select_backend(n_rows, name=None):
+    """Returns the backend for a dataset of n_rows: the one named (default DEFAULT_BACKEND),
+    or in auto mode an installed engine for large datasets and pandas otherwise."""
+    name = name or DEFAULT_BACKEND
+    if name != "auto":
+        return get_backend(name)
+    if n_rows >= AUTO_BACKEND_ROWS:
+        for engine in AUTO_BACKENDS:
+            if _MODULES[engine] is not None:
+                return get_backend(engine)
+    return get_backend("pandas")
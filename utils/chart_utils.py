@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+# Charts with more points than this are aggregated or downsampled before plotting
+DEFAULT_MAX_POINTS = 5000
+# Largest (bucket, candidate, point) table LTTB precomputes its choices in; larger inputs are scanned
+LTTB_TABLE_CELLS = 4_000_000
+
+
+def _as_float(values):
+    """Returns a float array suitable for binning; non-numeric values become category codes."""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        floats = values.to_numpy(dtype="datetime64[ns]").view("int64").astype("float64")
+        # NaT is stored as the smallest int64
+        floats[values.isna().to_numpy()] = np.nan
+        return floats
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return values.to_numpy(dtype="float64", na_value=np.nan)
+    codes, _ = pd.factorize(values, use_na_sentinel=True)
+    return np.where(codes >= 0, codes, np.nan).astype("float64")
+
+
+def histogram_data(series, nbins=30):
+    """Returns the bin edges, centres and counts of a numeric column."""
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return pd.DataFrame({"left": [], "right": [], "center": [], "count": []})
+    counts, edges = np.histogram(values, bins=nbins)
+    return pd.DataFrame({
+        "left": edges[:-1],
+        "right": edges[1:],
+        "center": (edges[:-1] + edges[1:]) / 2,
+        "count": counts,
+    })
+
+
+def box_data(series, max_outliers=DEFAULT_MAX_POINTS):
+    """Returns the box plot summary of a numeric column and a sample of its outliers."""
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    outliers = values[~inside]
+    if len(outliers) > max_outliers:
+        outliers = np.random.default_rng(0).choice(outliers, max_outliers, replace=False)
+    return {
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "mean": values.mean(),
+        "lowerfence": values[inside].min(),
+        "upperfence": values[inside].max(),
+        "outliers": outliers,
+    }
+
+
+def box_data_from_profile(profile, col):
+    """Returns a box plot summary built from a profile's quartiles without scanning the data.
+
+    Whiskers are clipped to the column's range and outliers are not available.
+    """
+    stats = profile.numeric_stats.loc[col]
+    if not stats["count"]:
+        return None
+    iqr = stats["75%"] - stats["25%"]
+    return {
+        "q1": stats["25%"],
+        "median": stats["50%"],
+        "q3": stats["75%"],
+        "mean": stats["mean"],
+        "lowerfence": max(stats["min"], stats["25%"] - 1.5 * iqr),
+        "upperfence": min(stats["max"], stats["75%"] + 1.5 * iqr),
+        "outliers": np.empty(0),
+    }
+
+
+def lttb_indices(x, y, n_out):
+    """Returns the positions kept by Largest-Triangle-Three-Buckets downsampling.
+
+    `x` must be sorted. The first and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    kept = np.empty(n_out, dtype="int64")
+    kept[0], kept[-1] = 0, n - 1
+    # Bucket boundaries for the n - 2 interior points
+    bounds = np.linspace(1, n - 1, n_out - 1).astype("int64")
+    starts = bounds[:-1]
+    # Mean of each bucket's following bucket; the last bucket is followed by the last point
+    next_starts = np.append(bounds[1:-1], n - 1)
+    next_ends = np.append(bounds[2:], n)
+    sizes = next_ends - next_starts
+    next_x = np.add.reduceat(x, next_starts) / sizes
+    next_y = np.add.reduceat(y, next_starts) / sizes
+    # Twice the triangle area is |px * a + py * b + c| for the previously kept point (px, py);
+    # only that point depends on the scan, so the per-point terms are computed up front
+    bucket = np.repeat(np.arange(n_out - 2), np.diff(bounds))
+    a = y[1:n - 1] - next_y[bucket]
+    b = next_x[bucket] - x[1:n - 1]
+    c = x[1:n - 1] * next_y[bucket] - next_x[bucket] * y[1:n - 1]
+    ends = bounds[1:] - 1
+    width = int(np.diff(bounds).max())
+    if width == 1:
+        # One point per bucket: every point is kept
+        kept[1:-1] = starts
+        return kept
+    # Pad buckets to a common width so each step of the scan is one small array operation
+    offsets = np.minimum(starts[:, None] + np.arange(width), ends[:, None]) - 1
+    a, b, c = a[offsets], b[offsets], c[offsets]
+    if (n_out - 3) * width * width <= LTTB_TABLE_CELLS:
+        # The kept point of each bucket, for every candidate the previous bucket could keep;
+        # the scan then only follows these choices
+        px, py = x[offsets[:-1] + 1][:, :, None], y[offsets[:-1] + 1][:, :, None]
+        choices = np.argmax(np.abs(px * a[1:, None, :] + py * b[1:, None, :] + c[1:, None, :]), axis=2).tolist()
+        slot = int(np.argmax(np.abs(x[0] * a[0] + y[0] * b[0] + c[0])))
+        slots = [slot]
+        for choice in choices:
+            slot = choice[slot]
+            slots.append(slot)
+        kept[1:-1] = starts + np.array(slots)
+        return kept
+    previous = 0
+    for i in range(n_out - 2):
+        previous = starts[i] + int(np.argmax(np.abs(x[previous] * a[i] + y[previous] * b[i] + c[i])))
+        kept[i + 1] = previous
+    return kept
+
+
+def downsample_line(series, max_points=DEFAULT_MAX_POINTS):
+    """Returns the non-null values of a column indexed by position, LTTB-downsampled
+    to at most max_points."""
+    values = series.dropna()
+    values = pd.Series(values.to_numpy(), index=np.arange(len(values)), name=series.name)
+    if len(values) <= max_points:
+        return values
+    kept = lttb_indices(values.index.to_numpy(dtype="float64"), _as_float(values), max_points)
+    return values.iloc[kept]
+
+
+def downsample_scatter(df, x, y, max_points=DEFAULT_MAX_POINTS):
+    """Returns at most about max_points rows of df[[x, y]], keeping one point per occupied
+    cell of a 2D grid so the shape of the cloud and its outliers are preserved."""
+    data = df[[x, y]] if x != y else df[[x]]
+    if len(data) <= max_points:
+        return data
+    grid = max(int(max_points ** (1 / len(data.columns))), 1)
+    cells = np.zeros(len(data), dtype="int64")
+    valid = np.ones(len(data), dtype=bool)
+    for col in data.columns:
+        values = _as_float(data[col])
+        valid &= ~np.isnan(values)
+        if not valid.any():
+            return data.iloc[:0]
+        lo, hi = np.nanmin(values), np.nanmax(values)
+        scale = (grid - 1) / (hi - lo) if hi > lo else 0.0
+        binned = np.nan_to_num((values - lo) * scale).astype("int64")
+        cells = cells * grid + binned
+    _, first = np.unique(cells[valid], return_index=True)
+    positions = np.flatnonzero(valid)[first]
+    if len(positions) > max_points:
+        positions = np.random.default_rng(0).choice(positions, max_points, replace=False)
+    return data.iloc[np.sort(positions)]
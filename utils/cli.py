@@ -0,0 +1,93 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from utils.api import compare_report, load_dataset, profile_file, profile_files
+from utils.compare import PROFILE_WORKERS
+from utils.csv_reader import csv_sources
+
+
+def _write(report, out):
+    text = json.dumps(report, indent=2, default=str)
+    if out is None:
+        print(text)
+    else:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(out).write_text(text + "\n")
+
+
+def _approximate(args):
+    # None lets the file size decide, as on the upload pages
+    return True if args.approximate else False if args.exact else None
+
+
+def profile_command(args):
+    if len(args.files) == 1 and args.out_dir is None:
+        path = args.files[0]
+        try:
+            reports = [profile_file(source, _approximate(args), name) for name, source in csv_sources(path, Path(path).name)]
+        except Exception as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+        # A zip archive of several CSVs gives a list of reports
+        _write(reports[0] if len(reports) == 1 else reports, args.out)
+        return 0
+    if args.out_dir is None:
+        print("Profiling several files needs --out-dir", file=sys.stderr)
+        return 2
+    failed = 0
+    for path, report, error in profile_files(args.files, _approximate(args), args.workers):
+        if error is not None:
+            failed += 1
+            print(f"{path}: {error}", file=sys.stderr)
+            continue
+        out = Path(args.out_dir) / (report["name"].replace("/", "_") + ".json")
+        _write(report, out)
+        print(f"{path} -> {out}")
+    return 1 if failed else 0
+
+
+def compare_command(args):
+    datasets = []
+    for path in (args.baseline, args.current):
+        try:
+            datasets.append(load_dataset(path, approximate=_approximate(args)))
+        except Exception as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+    try:
+        report = compare_report(*datasets, args.keys)
+    except (KeyError, ValueError) as e:
+        print(f"Cannot compare {args.baseline} and {args.current}: {e}", file=sys.stderr)
+        return 1
+    _write(report, args.out)
+    return 0
+
+
+def main(argv=None):
+    """Runs the command line interface: `python -m utils profile file.csv --out report.json`."""
+    parser = argparse.ArgumentParser(prog="python -m utils", description="Profile and compare CSV files without the web app.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    profile = commands.add_parser("profile", help="Profile one or more CSV files")
+    profile.add_argument("files", nargs="+")
+    profile.add_argument("--out", help="Report file for a single file (default: stdout); a zip archive of several CSVs gives a list")
+    profile.add_argument("--out-dir", help="Directory receiving one <file>.json report per CSV, archive members as <archive>_<member>.json")
+    profile.add_argument("--workers", type=int, default=PROFILE_WORKERS, help="Processes used for several files")
+    profile.set_defaults(run=profile_command)
+
+    compare = commands.add_parser("compare", help="Compare a CSV file against a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--keys", nargs="+", help="Key columns for the row-level diff")
+    compare.add_argument("--out", help="Report file (default: stdout)")
+    compare.set_defaults(run=compare_command)
+
+    for command in (profile, compare):
+        mode = command.add_mutually_exclusive_group()
+        mode.add_argument("--approximate", action="store_true", help="Always use sketch-based statistics")
+        mode.add_argument("--exact", action="store_true", help="Never use sketch-based statistics")
+
+    args = parser.parse_args(argv)
+    return args.run(args)
@@ -0,0 +1,139 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import popen_spawn_posix, reduction, resource_tracker, spawn, util
+from multiprocessing.context import SpawnContext, SpawnProcess, set_spawning_popen
+
+import pandas as pd
+
+from utils.profiling import build_profile
+from utils.sketches import build_approximate_profile
+from utils.storage import read_dataset
+
+# Worker processes used to profile datasets, overridable with EDA_WORKERS
+PROFILE_WORKERS = int(os.environ.get("EDA_WORKERS", min(os.cpu_count() or 1, 8)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class _WorkerPopen(popen_spawn_posix.Popen):
+    """Spawns a pool worker without the parent's __main__. Streamlit makes the running page
+    script __main__, and a spawned child re-runs whatever __main__ the parent has."""
+
+    def _launch(self, process_obj):
+        tracker_fd = resource_tracker.getfd()
+        self._fds.append(tracker_fd)
+        prep_data = spawn.get_preparation_data(process_obj._name)
+        prep_data.pop("init_main_from_name", None)
+        prep_data.pop("init_main_from_path", None)
+        data = io.BytesIO()
+        set_spawning_popen(self)
+        try:
+            reduction.dump(prep_data, data)
+            reduction.dump(process_obj, data)
+        finally:
+            set_spawning_popen(None)
+
+        parent_r, child_w = os.pipe()
+        child_r, parent_w = os.pipe()
+        try:
+            cmd = spawn.get_command_line(tracker_fd=tracker_fd, pipe_handle=child_r)
+            self._fds.extend([child_r, child_w])
+            self.pid = util.spawnv_passfds(spawn.get_executable(), cmd, self._fds)
+            self.sentinel = parent_r
+            with open(parent_w, "wb", closefd=False) as pipe:
+                pipe.write(data.getbuffer())
+        finally:
+            self.finalizer = util.Finalize(self, util.close_fds, (parent_r, parent_w))
+            os.close(child_r)
+            os.close(child_w)
+
+
+class _WorkerProcess(SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _WorkerPopen(process_obj)
+
+
+class _WorkerContext(SpawnContext):
+    Process = _WorkerProcess
+
+
+def profile_executor():
+    """Returns the shared process pool, starting it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned, not forked: a fork of the threaded server could inherit locks held by other threads
+            _executor = ProcessPoolExecutor(PROFILE_WORKERS, mp_context=_WorkerContext())
+        return _executor
+
+
+def profile_stored_dataset(path, content_hash, approximate=False):
+    """Reads a stored dataset and returns its content hash and profile.
+
+    Runs in a worker process: only the path goes in and only the profile comes back.
+    """
+    df = read_dataset(path)
+    return content_hash, build_approximate_profile(df) if approximate else build_profile(df)
+
+
+def profile_datasets(datasets):
+    """Makes sure every dataset in a list of registry entries has a profile, profiling the
+    missing ones concurrently. Datasets that still match their stored copy are profiled in
+    the process pool straight from disk; edited ones are profiled in this process."""
+    pending = {}
+    for dataset in datasets:
+        if dataset.path is not None and dataset.profiler.cached_profile() is None:
+            pending[dataset] = profile_executor().submit(profile_stored_dataset, str(dataset.path),
+                                                         dataset.profiler.fingerprint, dataset.profiler.approximate)
+    # Edited datasets are profiled here while the workers run
+    for dataset in datasets:
+        if dataset not in pending:
+            dataset.profiler.profile
+    for dataset, future in pending.items():
+        content_hash, profile = future.result()
+        dataset.profiler.set_profile(profile, content_hash)
+
+
+def schema_matrix(datasets):
+    """Returns a column x dataset matrix of dtypes; columns a dataset lacks are empty."""
+    return pd.DataFrame({
+        dataset.name: pd.Series({col: str(dtype) for col, dtype in dataset.profiler.profile.dtypes.items()}, dtype=object)
+        for dataset in datasets
+    })
+
+
+def metrics_matrix(datasets):
+    """Returns a dataset x metric matrix of shape and missing-value counts."""
+    rows = {}
+    for dataset in datasets:
+        profile = dataset.profiler.profile
+        rows[dataset.name] = {
+            "Rows": profile.n_rows,
+            "Columns": profile.n_cols,
+            "Missing Values": profile.total_missing,
+            "Missing %": 100 * profile.total_missing / max(profile.n_rows * profile.n_cols, 1),
+            "Numeric Columns": len(profile.numeric_columns),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def drift_matrix(baseline, datasets, metric="PSI"):
+    """Returns a dataset x column matrix of one drift metric against a baseline dataset."""
+    rows = {}
+    for dataset in datasets:
+        if dataset is baseline:
+            continue
+        report = baseline.profiler.get_drift(dataset.profiler)
+        rows[dataset.name] = report.set_index("Column")[metric]
+    columns = [col for col in baseline.profiler.profile.columns if any(col in row.index for row in rows.values())]
+    return pd.DataFrame.from_dict(rows, orient="index").reindex(columns=columns).astype("float64") if rows else pd.DataFrame()
+
+
+def schema_differences(schema):
+    """Returns the rows of a schema matrix whose dtype or presence differs across datasets."""
+    values = schema.fillna("").to_numpy()
+    return schema[(values != values[:, :1]).any(axis=1)] if len(schema) else schema
@@ -0,0 +1,137 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Correlation measures offered by the heatmap; Cramér's V applies to categorical columns
+CORRELATION_METHODS = ["Pearson", "Spearman", "Cramér's V"]
+# Rows standardised and multiplied at a time, bounding the float64 copy of the data
+CORR_CHUNK_ROWS = 250_000
+# Categorical columns with more distinct values than this are left out of Cramér's V
+CRAMERS_MAX_LEVELS = 100
+# Heatmaps of more columns than this are drawn without cell labels
+HEATMAP_LABEL_COLUMNS = 20
+
+
+def _pairwise_sums(chunk, center, scale):
+    """Returns the pairwise-complete counts, sums, sums of squares and cross products of a
+    standardised float chunk: entry [i, j] covers the rows where both i and j are present."""
+    z = (chunk - center) / scale
+    valid = ~np.isnan(z)
+    if valid.all():
+        n = np.full((z.shape[1], z.shape[1]), float(len(z)))
+        sums = np.broadcast_to(z.sum(axis=0)[:, None], n.shape)
+        squares = np.broadcast_to((z * z).sum(axis=0)[:, None], n.shape)
+        return n, sums, squares, z.T @ z
+    z = np.where(valid, z, 0.0)
+    mask = valid.astype("float64")
+    return mask.T @ mask, z.T @ mask, (z * z).T @ mask, z.T @ z
+
+
+def pearson(df, cols, progress=None, chunk_rows=CORR_CHUNK_ROWS):
+    """Returns the Pearson correlation matrix of numeric columns with missing values
+    handled pairwise, like DataFrame.corr().
+
+    Rows are standardised chunk by chunk and reduced with matrix products, so the work
+    is a handful of BLAS calls per chunk. `progress` is called with the fraction of rows
+    done before each chunk.
+    """
+    k, n_rows = len(cols), len(df)
+    n, sums, squares, products = (np.zeros((k, k)) for _ in range(4))
+    center = scale = None
+    for start in range(0, max(n_rows, 1), chunk_rows):
+        if progress:
+            progress(start / max(n_rows, 1))
+        chunk = df[cols].iloc[start:start + chunk_rows].to_numpy(dtype="float64", na_value=np.nan)
+        if center is None:
+            # Standardising on the first chunk keeps the sums well conditioned; the
+            # pairwise formula below is exact for any centre and scale
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                center = np.nan_to_num(np.nanmean(chunk, axis=0))
+                scale = np.nanstd(chunk, axis=0)
+            scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        parts = _pairwise_sums(chunk, center, scale)
+        for total, part in zip((n, sums, squares, products), parts):
+            total += part
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = products - sums * sums.T / n
+        var = squares - sums * sums / n
+        corr = cov / np.sqrt(var * var.T)
+    corr[n < 2] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.diag(var) > 0, 1.0, np.nan))
+    return pd.DataFrame(corr, index=cols, columns=cols)
+
+
+def spearman(df, cols, progress=None, chunk_rows=CORR_CHUNK_ROWS):
+    """Returns the Spearman rank correlation matrix of numeric columns.
+
+    Each column is ranked once over its own non-missing values and the ranks are
+    correlated pairwise, which matches DataFrame.corr("spearman") on complete data.
+    """
+    return pearson(rank_frame(df, cols), cols, progress, chunk_rows)
+
+
+def rank_frame(df, cols):
+    """Returns the average ranks of each column over its non-missing values (NaN elsewhere)."""
+    return pd.DataFrame({col: df[col].rank(method="average") for col in cols})
+
+
+def cramers_v(df, cols, progress=None):
+    """Returns the matrix of Cramér's V association (0 to 1) between categorical columns,
+    using the rows where both columns of a pair are present."""
+    codes = {}
+    for col in cols:
+        col_codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+        codes[col] = (col_codes.astype("int64"), len(uniques))
+    k = len(cols)
+    result = np.eye(k)
+    pairs = [(i, j) for i in range(k) for j in range(i + 1, k)]
+    for done, (i, j) in enumerate(pairs):
+        if progress:
+            progress(done / len(pairs))
+        (a, levels_a), (b, levels_b) = codes[cols[i]], codes[cols[j]]
+        both = (a >= 0) & (b >= 0)
+        cells = np.bincount(a[both] * levels_b + b[both], minlength=levels_a * levels_b)
+        table = cells.reshape(levels_a, levels_b).astype("float64")
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        total = table.sum()
+        if min(table.shape) < 2:
+            value = np.nan
+        else:
+            expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / total
+            chi2 = ((table - expected) ** 2 / expected).sum()
+            value = np.sqrt(chi2 / total / (min(table.shape) - 1))
+        result[i, j] = result[j, i] = value
+    for i, col in enumerate(cols):
+        if codes[col][1] < 2:
+            result[i, i] = np.nan
+    return pd.DataFrame(result, index=cols, columns=cols)
+
+
+def correlation_matrix(df, cols, method="Pearson", progress=None):
+    """Returns the correlation matrix of `cols` for one of CORRELATION_METHODS."""
+    if method == "Pearson":
+        return pearson(df, cols, progress)
+    if method == "Spearman":
+        return spearman(df, cols, progress)
+    if method == "Cramér's V":
+        return cramers_v(df, cols, progress)
+    raise ValueError(f"Unknown correlation method: {method}")
+
+
+def top_pairs(corr, k=20):
+    """Returns the k column pairs with the strongest correlation, strongest first."""
+    values = corr.to_numpy()
+    rows, cols = np.triu_indices(len(values), k=1)
+    strengths = values[rows, cols]
+    keep = ~np.isnan(strengths)
+    rows, cols, strengths = rows[keep], cols[keep], strengths[keep]
+    order = np.argsort(-np.abs(strengths), kind="stable")[:k]
+    return pd.DataFrame({
+        "Column 1": corr.index[rows[order]],
+        "Column 2": corr.columns[cols[order]],
+        "Correlation": strengths[order],
+    })
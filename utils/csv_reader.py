@@ -0,0 +1,323 @@
+import contextlib
+import io
+import os
+import warnings
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
+
+from utils.dtypes import DATE_SAMPLE_SIZE, STRING_DTYPE
+
+# Bytes read from the head of a file to infer its column types
+SCHEMA_SAMPLE_BYTES = 1024 * 1024
+# Bytes the Arrow reader parses per block; each block is profiled as one chunk
+ARROW_BLOCK_BYTES = 16 * 1024 * 1024
+# CSV parser: "arrow" (multi-threaded, falls back to pandas) or "pandas", set with EDA_CSV_ENGINE
+CSV_ENGINE = os.environ.get("EDA_CSV_ENGINE", "arrow")
+# Threads Arrow parses with (default: one per core), set with EDA_PARSE_THREADS
+PARSE_THREADS = int(os.environ.get("EDA_PARSE_THREADS", 0))
+# Share of sampled values that must look like numbers or dates for a text column to be flagged
+AMBIGUOUS_SHARE = 0.9
+# Sampled values of a text column tried as dates before all sampled values are
+DATE_PROBE_SIZE = 20
+# Types a user can force on a column; forced values that do not fit become missing
+COLUMN_TYPES = ["Auto", "Text", "Number", "Date/time"]
+
+# Codecs of compressed CSVs, by the bytes their files start with
+COMPRESSION_MAGIC = {b"\x1f\x8b": "gzip", b"BZh": "bz2", b"\x28\xb5\x2f\xfd": "zstd", b"PK\x03\x04": "zip",
+                     b"PK\x05\x06": "zip"}
+
+_EMPTY = "empty in the sampled rows"
+
+if PARSE_THREADS:
+    pa.set_cpu_count(PARSE_THREADS)
+
+
+class CSVParseError(ValueError):
+    """Raised when neither the Arrow nor the pandas reader can parse a file."""
+
+
+class ParseStats:
+    """How a file was parsed: the reader used, its throughput, why Arrow was not used
+    (if it was not) and the columns whose type was ambiguous in the sampled rows."""
+
+    def __init__(self):
+        self.engine = None
+        self.bytes = 0
+        self.seconds = 0.0
+        self.threads = 1
+        self.fallback = None
+        self.ambiguous = {}
+        self.compression = None
+        self.compressed_bytes = 0
+
+    @property
+    def mb_per_s(self):
+        return self.bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        threads = f"{self.threads} thread{'s' if self.threads > 1 else ''}"
+        summary = f"{self.bytes / 1024 / 1024:,.1f} MB parsed at {self.mb_per_s:,.1f} MB/s ({self.engine}, {threads})"
+        if self.compression:
+            summary += f", decompressed from {self.compressed_bytes / 1024 / 1024:,.1f} MB {self.compression}"
+        return summary
+
+
+def detect_compression(path):
+    """Returns "gzip", "bz2", "zstd" or "zip" for a compressed file, going by its first
+    bytes rather than its name, or None for a plain file."""
+    with open(path, "rb") as handle:
+        start = handle.read(4)
+    return next((codec for magic, codec in COMPRESSION_MAGIC.items() if start.startswith(magic)), None)
+
+
+class _CountingReader(io.RawIOBase):
+    """Wraps a decompressing stream, which cannot tell its position, to count the bytes read."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def tell(self):
+        return self.count
+
+
+class CSVSource:
+    """A CSV to parse: a plain file, a gzip, bz2 or zstd compressed file, or a member of a
+    zip archive. Compressed data is decompressed as it is parsed; the decompressed CSV is
+    never written to disk or held in memory whole."""
+
+    def __init__(self, path, compression=None, member=None):
+        self.path = str(path)
+        self.compression = compression
+        self.member = member
+
+    @property
+    def size(self):
+        """Returns the bytes the CSV takes on disk, compressed if it is."""
+        if self.member is not None:
+            with zipfile.ZipFile(self.path) as archive:
+                return archive.getinfo(self.member).compress_size
+        return os.path.getsize(self.path)
+
+    @contextlib.contextmanager
+    def open(self):
+        """Yields a binary stream of the decompressed CSV, whose tell() is the number of
+        decompressed bytes read, and a callable returning the bytes consumed on disk."""
+        if self.member is not None:
+            with open(self.path, "rb") as raw, zipfile.ZipFile(raw) as archive:
+                info = archive.getinfo(self.member)
+                with archive.open(info) as stream:
+                    yield stream, lambda: raw.tell() - info.header_offset
+        elif self.compression:
+            with pa.OSFile(self.path) as raw:
+                yield _CountingReader(pa.CompressedInputStream(raw, self.compression)), raw.tell
+        else:
+            # A native file keeps blocks out of Python memory and still reports its position
+            with pa.OSFile(self.path) as handle:
+                yield handle, handle.tell
+
+    def uncompressed_size(self):
+        """Returns the size of the decompressed CSV; for gzip, bz2 and zstd files it is
+        estimated from the compression ratio of the file's head."""
+        if self.member is not None:
+            with zipfile.ZipFile(self.path) as archive:
+                return archive.getinfo(self.member).file_size
+        if not self.compression:
+            return self.size
+        with self.open() as (stream, consumed):
+            head = stream.read(SCHEMA_SAMPLE_BYTES)
+            if len(head) < SCHEMA_SAMPLE_BYTES:
+                return len(head)
+            return int(self.size * len(head) / max(consumed(), 1))
+
+
+def as_source(path):
+    """Returns the CSVSource of a file, detecting its compression; a zip archive must hold
+    exactly one CSV."""
+    if isinstance(path, CSVSource):
+        return path
+    compression = detect_compression(path)
+    if compression != "zip":
+        return CSVSource(path, compression)
+    sources = csv_sources(path, os.path.basename(path))
+    if len(sources) > 1:
+        raise CSVParseError(f"{path} holds {len(sources)} CSV files, not one")
+    return sources[0][1]
+
+
+def csv_sources(path, name):
+    """Returns (dataset name, CSVSource) for each CSV in an uploaded file: the file itself,
+    or each CSV in a zip archive, named "<archive name>/<member>"."""
+    compression = detect_compression(path)
+    if compression != "zip":
+        return [(name, CSVSource(path, compression))]
+    try:
+        with zipfile.ZipFile(path) as archive:
+            members = [info.filename for info in archive.infolist()
+                       if not info.is_dir() and info.filename.lower().endswith(".csv")
+                       and not info.filename.startswith("__MACOSX/")]
+    except zipfile.BadZipFile as e:
+        raise CSVParseError(f"Not a readable zip archive: {e}") from e
+    if not members:
+        raise CSVParseError(f"{name} contains no CSV files")
+    return [(f"{name}/{member}", CSVSource(path, "zip", member)) for member in members]
+
+
+def _head(source, sample_bytes):
+    """Returns the first sample_bytes of a CSV, cut after the last complete line."""
+    with source.open() as (stream, _):
+        head = stream.read(sample_bytes)
+        more = stream.read(1)
+    if more and b"\n" in head:
+        head = head[:head.rindex(b"\n") + 1]
+    return head
+
+
+def _column_names(names):
+    """Returns the header as pandas names it; duplicate names are left to pandas to mangle."""
+    names = [name if name else f"Unnamed: {i}" for i, name in enumerate(names)]
+    if len(set(names)) != len(names):
+        raise pa.ArrowInvalid("duplicate column names")
+    return names
+
+
+def _share(converted, values):
+    return converted.notna().sum() / len(values) if len(values) else 0.0
+
+
+def _dates(values):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(values, errors="coerce", format="mixed")
+
+
+def sample_schema(path, sample_bytes=SCHEMA_SAMPLE_BYTES):
+    """Infers column types from the head of a CSV file or CSVSource. Returns the column
+    names, their Arrow types and {column: reason} for the columns whose type is ambiguous there."""
+    head = _head(as_source(path), sample_bytes)
+    options = pacsv.ConvertOptions(strings_can_be_null=True)
+    typed = pacsv.read_csv(io.BytesIO(head), convert_options=options)
+    names = _column_names(typed.column_names)
+    read_options = pacsv.ReadOptions(column_names=names, skip_rows=1)
+    raw = pacsv.read_csv(io.BytesIO(head), read_options=read_options, convert_options=pacsv.ConvertOptions(
+        column_types={name: pa.string() for name in names}, strings_can_be_null=True))
+
+    types, ambiguous = {}, {}
+    for name, field in zip(names, typed.schema):
+        types[name] = field.type
+        values = raw.column(name).to_pandas().dropna().head(DATE_SAMPLE_SIZE)
+        if pa.types.is_null(field.type):
+            # Read as text; chunks whose values are all numbers become numeric
+            types[name] = pa.string()
+            ambiguous[name] = _EMPTY
+        elif pa.types.is_integer(field.type) and values.str.match(r"[+-]?0\d").any():
+            ambiguous[name] = "numbers with leading zeros, e.g. codes"
+        elif pa.types.is_string(field.type) and len(values):
+            if _share(pd.to_numeric(values, errors="coerce"), values) >= AMBIGUOUS_SHARE:
+                ambiguous[name] = "mostly numbers"
+            elif _share(_dates(values.head(DATE_PROBE_SIZE)), values.head(DATE_PROBE_SIZE)) >= AMBIGUOUS_SHARE:
+                # Free-form date parsing is slow, so only columns whose first values parse are checked in full
+                if _share(_dates(values), values) >= AMBIGUOUS_SHARE:
+                    ambiguous[name] = "looks like dates"
+    return names, types, ambiguous
+
+
+def apply_column_types(chunk, column_types):
+    """Converts the columns of a parsed chunk to the types forced on them; values that do
+    not fit become missing."""
+    for col, kind in column_types.items():
+        if col not in chunk.columns or kind == "Auto":
+            continue
+        series = chunk[col]
+        if kind == "Text":
+            chunk[col] = series.where(series.isna(), series.astype(str)).astype(STRING_DTYPE)
+        elif kind == "Number":
+            chunk[col] = pd.to_numeric(series, errors="coerce")
+        elif kind == "Date/time":
+            chunk[col] = _dates(series)
+        else:
+            raise ValueError(f"Unknown column type: {kind}")
+    return chunk
+
+
+def _numeric_if_all(chunk, cols):
+    """Converts text columns whose values in this chunk are all numbers, as pandas would have."""
+    for col in cols:
+        converted = pd.to_numeric(chunk[col], errors="coerce")
+        if converted.notna().sum() == chunk[col].notna().sum():
+            chunk[col] = converted
+    return chunk
+
+
+def arrow_chunks(path, column_types=None, progress=None, stats=None):
+    """Yields the frame of a CSV file or CSVSource one block at a time, parsed on Arrow's
+    thread pool with the column types sampled from its head. `column_types` forces
+    COLUMN_TYPES on columns. `progress` is called with (bytes_consumed, total_bytes) of
+    the file on disk after each block. Raises pyarrow.ArrowInvalid if a later block does
+    not fit the sampled types."""
+    source = as_source(path)
+    names, types, ambiguous = sample_schema(source)
+    if stats is not None:
+        stats.ambiguous = ambiguous
+    forced = {col: kind for col, kind in (column_types or {}).items() if kind != "Auto" and col in types}
+    # Forced columns are read as text and converted in pandas
+    types.update({col: pa.string() for col in forced})
+    late = [col for col, reason in ambiguous.items() if reason == _EMPTY and col not in forced]
+    total = source.size
+    read_options = pacsv.ReadOptions(column_names=names, skip_rows=1, block_size=ARROW_BLOCK_BYTES, use_threads=True)
+    convert_options = pacsv.ConvertOptions(column_types=types, strings_can_be_null=True)
+    with source.open() as (stream, consumed):
+        reader = pacsv.open_csv(stream, read_options=read_options, convert_options=convert_options)
+        try:
+            empty = True
+            for batch in reader:
+                empty = False
+                chunk = batch.to_pandas(date_as_object=False, coerce_temporal_nanoseconds=True)
+                yield apply_column_types(_numeric_if_all(chunk, late), forced)
+                if progress:
+                    progress(min(consumed(), total), total)
+            if empty:
+                # Header-only files still have columns
+                yield apply_column_types(reader.schema.empty_table().to_pandas(), forced)
+        finally:
+            reader.close()
+        if stats is not None:
+            stats.bytes = stream.tell()
+
+
+def pandas_chunks(path, chunk_rows, column_types=None, progress=None, stats=None):
+    """Yields the frame of a CSV file or CSVSource chunk by chunk, parsed by pandas."""
+    source = as_source(path)
+    forced = {col: kind for col, kind in (column_types or {}).items() if kind != "Auto"}
+    # Forced columns are read as text (keeping e.g. leading zeros) and converted afterwards
+    text = {col: str for col in forced}
+    total = source.size
+    empty = True
+    with source.open() as (stream, consumed):
+        for chunk in pd.read_csv(stream, chunksize=chunk_rows, dtype=text):
+            empty = False
+            yield apply_column_types(chunk, forced)
+            if progress:
+                progress(min(consumed(), total), total)
+        if stats is not None:
+            stats.bytes = stream.tell()
+    if empty:
+        # Header-only files yield no chunks
+        with source.open() as (stream, _):
+            yield apply_column_types(pd.read_csv(stream, dtype=text), forced)
@@ -1,8 +1,148 @@
-import pandas as pd
+from utils.cache import derive_fingerprint, fingerprint as content_fingerprint, profile_cache
+from utils.backends import get_backend, select_backend
+from utils.chart_utils import downsample_line
+from utils.correlation import CRAMERS_MAX_LEVELS
+from utils.dtypes import is_categorical, is_datetime, is_numeric
+from utils.drift import drift_report
+from utils.edits import editor_delta
+from utils.export import export_bytes
+from utils.metrics import instrument
+from utils.paging import view_positions
+from utils.profiling import update_profile
+from utils.sketches import build_approximate_profile
 
+# Rows profiled per chunk when a profile is built as a background job
+PROFILE_CHUNK_ROWS = 1_000_000
+
+
+@instrument("profiler", ["compute_profile", "apply_delta", "get_view", "get_export", "get_correlation", "get_diff", "get_drift",
+                         "get_aggregate", "get_line"])
 class DataProfiler:
-    def __init__(self, df):
-        self.df = df
+    def __init__(self, df, fingerprint=None, profile=None, approximate=None, loader=None, backend=None):
+        self._df = df
+        # Reloads the frame after the memory governor unloaded it
+        self._loader = loader
+        self._fingerprint = fingerprint
+        self._profile = profile
+        # Sketch-based statistics; defaults to the mode of a supplied profile
+        self.approximate = approximate if approximate is not None else bool(profile is not None and profile.approximate)
+        # Compute backend name; chosen by dataset size when first needed unless given
+        self._backend = backend
+
+    @property
+    def df(self):
+        """Returns the frame, reloading it first if it was unloaded."""
+        df = self._df
+        if df is None and self._loader is not None:
+            df = self._df = self._loader()
+        return df
+
+    @property
+    def loaded(self):
+        return self._df is not None
+
+    def unload(self, loader):
+        """Drops this profiler's reference to the frame; `loader` returns it again when it
+        is next read. Cached results stay valid, as the fingerprint is kept."""
+        # Hash the frame now so the reloaded copy keeps the same cache keys
+        self.fingerprint
+        self._loader = loader
+        self._df = None
+
+    @property
+    def backend(self):
+        """Returns the compute backend that profiles, aggregates and correlates this dataset.
+        Backends return identical results, so cached results are shared between them."""
+        if self._backend is None:
+            self._backend = select_backend(len(self.df)).name
+        return get_backend(self._backend)
+
+    @property
+    def fingerprint(self):
+        """Returns the content fingerprint used to key cached results for this dataset."""
+        if self._fingerprint is None:
+            self._fingerprint = content_fingerprint(self.df)
+        return self._fingerprint
+
+    @property
+    def profile(self):
+        """Returns the single-pass profile of the dataset, shared through the profile cache."""
+        if self._profile is None:
+            key, compute = self.profile_task()
+            self._profile = profile_cache.get_or_compute(key, lambda: compute(None))
+        return self._profile
+
+    def cached_profile(self):
+        """Returns the profile if it is already computed or cached, without computing it."""
+        if self._profile is None and self._fingerprint is not None:
+            self._profile = profile_cache.get((self._fingerprint, self._profile_key()))
+        return self._profile
+
+    def set_profile(self, profile, fingerprint=None):
+        """Adopts a profile computed elsewhere (e.g. in a worker process) and caches it.
+        `fingerprint` is used if this profiler does not have one yet."""
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint
+        self._profile = profile_cache.put((self.fingerprint, self._profile_key()), profile)
+
+    def profile_task(self):
+        """Returns the (cache key, compute) pair of the profile, to run as a background job."""
+        return (self.fingerprint, self._profile_key()), self.compute_profile
+
+    def compute_profile(self, progress=None):
+        """Profiles the dataset, bypassing the profile cache."""
+        if self.approximate:
+            return build_approximate_profile(self.df, progress=progress)
+        # Chunking lets a background job report progress and stop when cancelled
+        chunk_rows = PROFILE_CHUNK_ROWS if len(self.df) > PROFILE_CHUNK_ROWS else None
+        return self.backend.profile(self.df, chunk_rows, progress)
+
+    def _profile_key(self):
+        return "approximate_profile" if self.approximate else "profile"
+
+    def apply_edits(self, edited_df, editor_state):
+        """Returns a profiler for the frame st.data_editor returned, updating the exact
+        profile from the edited cells instead of re-profiling the whole frame."""
+        return self.apply_delta(edited_df, lambda: editor_delta(self.df, edited_df, editor_state), editor_state)
+
+    def apply_delta(self, edited_df, delta, revision):
+        """Returns a profiler for edited_df, whose profile is this one's with a cell-level delta
+        (or a callable producing it) applied. `revision` identifies the edit in the cache.
+
+        Falls back to a full profile in approximate mode (sketches cannot forget deleted
+        values) or when an edit changed a column's dtype.
+        """
+        key = derive_fingerprint(self.fingerprint, revision)
+        profiler = DataProfiler(edited_df, fingerprint=key, approximate=self.approximate, backend=self._backend)
+        profile = self.profile
+        if self.approximate or not profile.value_tables or not edited_df.dtypes.equals(profile.dtypes):
+            return profiler
+        profiler._profile = profile_cache.get_or_compute(
+            (key, "profile"),
+            lambda: update_profile(profile, delta() if callable(delta) else delta, len(edited_df))
+        )
+        return profiler
+
+    def get_view(self, sort_by=None, ascending=True, filter_col=None, filter_text=""):
+        """Returns the row positions of a sorted and filtered view of the dataset."""
+        return profile_cache.get_or_compute(
+            (self.fingerprint, "view", sort_by, ascending, filter_col, filter_text),
+            lambda: view_positions(self.df, sort_by, ascending, filter_col, filter_text)
+        )
+
+    def get_export(self, fmt, prepare=True):
+        """Returns the dataset serialised in an export format, cached per revision.
+
+        With prepare=False only an export that is already cached is returned (else None).
+        """
+        key, compute = self.export_task(fmt)
+        if not prepare:
+            return profile_cache.get(key)
+        return profile_cache.get_or_compute(key, lambda: compute(None))
+
+    def export_task(self, fmt):
+        """Returns the (cache key, compute) pair of an export, to run as a background job."""
+        return (self.fingerprint, "export", fmt), lambda report: export_bytes(self.df, fmt, report)
 
     def get_basic_info(self):
         """Returns basic information about the dataset."""
@@ -13,22 +153,73 @@ class DataProfiler:
 
     def get_summary_stats(self):
         """Returns summary statistics for numeric columns."""
-        return self.df.describe()
+        return self.profile.summary_stats()
 
     def get_missing_values(self):
         """Returns a dataframe with the count and percentage of missing values per column."""
-        missing_count = self.df.isnull().sum()
-        missing_percent = (missing_count / len(self.df)) * 100
-        missing_df = pd.DataFrame({
-            "Missing Count": missing_count,
-            "Missing Percent": missing_percent
-        })
-        return missing_df[missing_df["Missing Count"] > 0]
+        return self.profile.missing_values()
+
+    def get_value_counts(self, col, n=10):
+        """Returns the n most frequent values of a column."""
+        return self.profile.value_counts(col, n)
+
+    def correlation_columns(self, method="Pearson"):
+        """Returns the columns a correlation method applies to: numeric columns, or for
+        Cramér's V categorical columns with at most CRAMERS_MAX_LEVELS distinct values."""
+        if method == "Cramér's V":
+            return [col for col in self.get_categorical_columns()
+                    if self.profile.distinct_counts[col] <= CRAMERS_MAX_LEVELS]
+        return self.get_numeric_columns()
+
+    def get_correlation(self, cols, method="Pearson"):
+        """Returns the correlation matrix of the given columns, sliced from the full matrix
+        of the dataset, which is computed once per revision and method."""
+        key, compute = self.correlation_task(method)
+        return profile_cache.get_or_compute(key, lambda: compute(None)).loc[list(cols), list(cols)]
+
+    def correlation_task(self, method="Pearson"):
+        """Returns the (cache key, compute) pair of the full correlation matrix, to run as a background job."""
+        cols = self.correlation_columns(method)
+        return (self.fingerprint, "corr", method), lambda report: self.backend.correlation(self.df, cols, method, report)
+
+    def get_diff(self, other, keys):
+        """Returns the keyed row-level differences between this dataset and another."""
+        key, compute = self.diff_task(other, keys)
+        return profile_cache.get_or_compute(key, lambda: compute(None))
+
+    def diff_task(self, other, keys):
+        """Returns the (cache key, compute) pair of a keyed row diff, to run as a background job."""
+        return (self.fingerprint, other.fingerprint, "diff", tuple(keys)), lambda report: self.backend.diff(self.df, other.df, keys, report)
+
+    def get_drift(self, other):
+        """Returns the per-column drift of another dataset against this one as the baseline."""
+        return profile_cache.get_or_compute(
+            (self.fingerprint, other.fingerprint, "drift"), lambda: drift_report(self.profile, other.profile)
+        )
+
+    def get_aggregate(self, group_col, col, agg):
+        """Returns an aggregation of a numeric column per group of group_col, read from the
+        group cube of all numeric columns, which is built once per revision and group column."""
+        cube = profile_cache.get_or_compute(
+            (self.fingerprint, "groupby", group_col),
+            lambda: self.backend.group_cube(self.df, group_col, self.get_numeric_columns())
+        )
+        return cube.aggregate(col, agg)
+
+    def get_line(self, col, max_points):
+        """Returns the LTTB-downsampled values of a column for line and area charts, cached per revision."""
+        return profile_cache.get_or_compute(
+            (self.fingerprint, "line", col, max_points), lambda: downsample_line(self.df[col], max_points=max_points)
+        )
 
     def get_numeric_columns(self):
-        """Returns a list of numeric columns."""
-        return list(self.df.select_dtypes(include=['int64', 'float64']).columns)
+        """Returns a list of numeric columns, including downcast and nullable ones."""
+        return [col for col, dtype in self.profile.dtypes.items() if is_numeric(dtype)]
 
     def get_categorical_columns(self):
-        """Returns a list of categorical columns."""
-        return list(self.df.select_dtypes(include=['object', 'category']).columns)
\ No newline at end of file
+        """Returns a list of categorical columns (object, category and string dtypes)."""
+        return [col for col, dtype in self.profile.dtypes.items() if is_categorical(dtype)]
+
+    def get_datetime_columns(self):
+        """Returns a list of datetime columns."""
+        return [col for col, dtype in self.profile.dtypes.items() if is_datetime(dtype)]
\ No newline at end of file
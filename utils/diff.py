@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from utils.dtypes import is_datetime, is_numeric
+
+# Rows of detail shown per page on the compare page
+DIFF_PAGE_ROWS = 100
+
+
+def _comparable(left, right):
+    """Returns the values of two columns as arrays of one common dtype, so equal values
+    compare equal even when the files were parsed to different widths or kinds."""
+    if is_numeric(left.dtype) and is_numeric(right.dtype):
+        if all(pd.api.types.is_integer_dtype(s.dtype) and isinstance(s.dtype, np.dtype) for s in (left, right)):
+            return left.to_numpy(dtype="int64"), right.to_numpy(dtype="int64")
+        return left.to_numpy(dtype="float64", na_value=np.nan), right.to_numpy(dtype="float64", na_value=np.nan)
+    if isinstance(left.dtype, pd.CategoricalDtype) and isinstance(right.dtype, pd.CategoricalDtype):
+        # Map both sides' category codes onto one shared list of categories; -1 stays missing
+        shared, _ = pd.factorize(left.cat.categories.append(right.cat.categories).astype(object))
+        n_left = len(left.cat.categories)
+        left_codes, right_codes = left.cat.codes.to_numpy(), right.cat.codes.to_numpy()
+        return (np.where(left_codes >= 0, shared[:n_left][left_codes], -1),
+                np.where(right_codes >= 0, shared[n_left:][right_codes], -1))
+    if is_datetime(left.dtype) and is_datetime(right.dtype):
+        return left.to_numpy(dtype="datetime64[ns]"), right.to_numpy(dtype="datetime64[ns]")
+    return left.to_numpy(dtype=object), right.to_numpy(dtype=object)
+
+
+def _joint_codes(left, right, na_sentinel=True):
+    """Factorizes two arrays against one shared table of uniques; missing values get -1
+    when na_sentinel is set and a code of their own otherwise."""
+    codes, _ = pd.factorize(np.concatenate([left, right]), use_na_sentinel=na_sentinel)
+    return codes[:len(left)], codes[len(left):]
+
+
+def _key_codes(df1, df2, keys):
+    """Returns one integer code per row of each frame such that rows share a code exactly
+    when all their key values are equal."""
+    codes1 = np.zeros(len(df1), dtype="int64")
+    codes2 = np.zeros(len(df2), dtype="int64")
+    for key in keys:
+        left, right = _joint_codes(*_comparable(df1[key], df2[key]), na_sentinel=False)
+        width = int(max(left.max(initial=0), right.max(initial=0))) + 1
+        # Re-factorize the combined codes so they stay below the number of rows
+        codes1, codes2 = _joint_codes(codes1 * width + left, codes2 * width + right)
+    return codes1, codes2
+
+
+def _first_positions(codes):
+    """Returns the distinct codes, the position of each one's first row and the number
+    of rows whose code repeats an earlier one."""
+    unique, first = np.unique(codes, return_index=True)
+    return unique, first, len(codes) - len(unique)
+
+
+class RowDiff:
+    """Row-level differences between two frames matched on key columns.
+
+    Holds positions only; pass the same frames back to the page methods for detail.
+    """
+
+    def __init__(self, keys, columns, removed, added, changed1, changed2, changed_mask,
+                 n_unchanged, duplicates1, duplicates2):
+        self.keys = keys
+        self.columns = columns
+        self.removed = removed
+        self.added = added
+        self.changed1 = changed1
+        self.changed2 = changed2
+        self.changed_mask = changed_mask
+        self.n_unchanged = n_unchanged
+        self.duplicates1 = duplicates1
+        self.duplicates2 = duplicates2
+
+    @property
+    def n_changed(self):
+        return len(self.changed1)
+
+    def column_changes(self):
+        """Returns the number of changed rows per compared column."""
+        return pd.Series(self.changed_mask.sum(axis=0), index=self.columns, dtype="int64")
+
+    def removed_rows(self, df1, page, page_rows=DIFF_PAGE_ROWS):
+        """Returns one page of the rows only present in the first frame."""
+        return df1.iloc[self.removed[(page - 1) * page_rows:page * page_rows]]
+
+    def added_rows(self, df2, page, page_rows=DIFF_PAGE_ROWS):
+        """Returns one page of the rows only present in the second frame."""
+        return df2.iloc[self.added[(page - 1) * page_rows:page * page_rows]]
+
+    def changed_cells(self, df1, df2, page, page_rows=DIFF_PAGE_ROWS):
+        """Returns the changed cells of one page of changed rows, one line per cell, with
+        the row's key values and the value before and after."""
+        window = slice((page - 1) * page_rows, page * page_rows)
+        rows, cols = np.nonzero(self.changed_mask[window])
+        pos1 = self.changed1[window][rows]
+        pos2 = self.changed2[window][rows]
+        cells = df1[self.keys].iloc[pos1].reset_index(drop=True)
+        names = np.asarray(self.columns, dtype=object)[cols]
+        cells["column"] = names
+        before = np.empty(len(rows), dtype=object)
+        after = np.empty(len(rows), dtype=object)
+        for col in set(names):
+            selected = names == col
+            before[selected] = df1[col].iloc[pos1[selected]].to_numpy(dtype=object)
+            after[selected] = df2[col].iloc[pos2[selected]].to_numpy(dtype=object)
+        cells["before"] = before
+        cells["after"] = after
+        return cells
+
+
+def diff_frames(df1, df2, keys, progress=None):
+    """Matches the rows of two frames on key columns with a hash join and compares the
+    other shared columns of the matched rows.
+
+    Rows are matched on their first occurrence when a key repeats within a frame.
+    `progress` is called with (fraction, stage) as columns are compared.
+    """
+    keys = list(keys)
+    columns = [col for col in df1.columns if col in df2.columns and col not in keys]
+    if progress:
+        progress(0.0, "Matching keys")
+    codes1, codes2 = _key_codes(df1, df2, keys)
+    unique1, first1, duplicates1 = _first_positions(codes1)
+    unique2, first2, duplicates2 = _first_positions(codes2)
+
+    # Codes are bounded by the row count, so a dense lookup table replaces the hash probe
+    lookup = np.full(len(df1) + len(df2) + 1, -1, dtype="int64")
+    lookup[unique1] = first1
+    match1 = lookup[unique2]
+    matched = match1 >= 0
+    pos1, pos2 = match1[matched], first2[matched]
+    lookup[:] = -1
+    lookup[unique2] = first2
+    removed = np.sort(first1[lookup[unique1] < 0])
+    added = np.sort(first2[~matched])
+
+    mask = np.zeros((len(pos1), len(columns)), dtype=bool)
+    for j, col in enumerate(columns):
+        if progress:
+            progress(0.1 + 0.9 * j / len(columns), f"Comparing {col}")
+        left, right = _comparable(df1[col].iloc[pos1], df2[col].iloc[pos2])
+        if left.dtype.kind in "iu":
+            mask[:, j] = left != right
+        elif left.dtype.kind == "f":
+            mask[:, j] = (left != right) & ~(np.isnan(left) & np.isnan(right))
+        else:
+            # Joint codes make missing values equal to each other and to nothing else
+            left, right = _joint_codes(left, right)
+            mask[:, j] = left != right
+    changed = mask.any(axis=1)
+    order = np.argsort(pos1[changed], kind="stable")
+    return RowDiff(keys, columns, removed, added, pos1[changed][order], pos2[changed][order],
+                   mask[changed][order], int((~changed).sum()), duplicates1, duplicates2)
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from utils.dtypes import is_datetime, is_numeric
+
+# Numeric columns are binned on the baseline's deciles for PSI and Jensen-Shannon distance
+DRIFT_BINS = 10
+# Floor applied to bin proportions so empty bins do not make PSI infinite
+PSI_EPSILON = 1e-4
+# PSI below the first threshold is stable, below the second moderate, above it major
+PSI_THRESHOLDS = (0.1, 0.25)
+# Label of the bucket holding values an approximate profile does not track individually
+OTHER_LABEL = "(other)"
+
+DRIFT_COLUMNS = ["Column", "Type", "PSI", "KS", "JS Distance", "Largest Shift", "Drift"]
+
+
+def psi(expected, actual):
+    """Returns the Population Stability Index between two arrays of bin proportions."""
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def js_distance(p, q):
+    """Returns the Jensen-Shannon distance (base 2, between 0 and 1) of two distributions."""
+    m = (p + q) / 2
+
+    def kl(a, b):
+        nonzero = a > 0
+        return np.sum(a[nonzero] * np.log2(a[nonzero] / b[nonzero]))
+
+    return float(np.sqrt(max((kl(p, m) + kl(q, m)) / 2, 0.0)))
+
+
+def _cdf(values, weights, points):
+    """Returns the fraction of the weighted values at or below each point."""
+    cumulative = np.concatenate([[0.0], np.cumsum(weights, dtype="float64")])
+    return cumulative[np.searchsorted(values, points, side="right")] / cumulative[-1]
+
+
+def _numeric_table(profile, col):
+    """Returns the sorted values and weights describing a column's distribution."""
+    table = profile.value_tables[col]
+    if isinstance(table, pd.Series):
+        # Exact profiles count datetimes as categories; order them on the time axis
+        values = table.index.to_numpy(dtype="datetime64[ns]").view("int64").astype("float64")
+        order = np.argsort(values)
+        return values[order], table.to_numpy(dtype="float64")[order]
+    values, weights = table
+    return values, np.asarray(weights, dtype="float64")
+
+
+def numeric_drift(baseline, current, label=lambda value: f"{value:.4g}"):
+    """Returns PSI, KS statistic, JS distance and the largest shift between two
+    (sorted values, weights) tables. `label` formats bin edges."""
+    (values1, weights1), (values2, weights2) = baseline, current
+    # Bin edges at the baseline's deciles
+    cumulative = np.cumsum(weights1) / weights1.sum()
+    deciles = np.arange(1, DRIFT_BINS) / DRIFT_BINS
+    edges = np.unique(values1[np.minimum(np.searchsorted(cumulative, deciles), len(values1) - 1)])
+    bounds = np.concatenate([[0.0], _cdf(values1, weights1, edges), [1.0]])
+    expected = np.diff(bounds)
+    actual = np.diff(np.concatenate([[0.0], _cdf(values2, weights2, edges), [1.0]]))
+    # The two empirical CDFs can only differ most at one of the observed values
+    points = np.union1d(values1, values2)
+    gaps = np.abs(_cdf(values1, weights1, points) - _cdf(values2, weights2, points))
+    shifted = int(np.argmax(np.abs(actual - expected)))
+    low = "-inf" if shifted == 0 else label(edges[shifted - 1])
+    high = "inf" if shifted == len(edges) else label(edges[shifted])
+    return {
+        "PSI": psi(expected, actual),
+        "KS": float(gaps.max()),
+        "JS Distance": js_distance(expected, actual),
+        "Largest Shift": f"({low}, {high}]: {expected[shifted]:.1%} → {actual[shifted]:.1%}",
+    }
+
+
+def categorical_drift(baseline, current, total1, total2):
+    """Returns PSI, JS distance and the largest shift between two category count tables.
+
+    Counts missing from a table (values an approximate profile did not keep) are pooled
+    into an OTHER_LABEL bucket so both distributions sum to one.
+    """
+    categories = baseline.index.append(current.index.difference(baseline.index, sort=False))
+    counts1 = baseline.reindex(categories, fill_value=0).to_numpy(dtype="float64")
+    counts2 = current.reindex(categories, fill_value=0).to_numpy(dtype="float64")
+    other1, other2 = max(total1 - counts1.sum(), 0), max(total2 - counts2.sum(), 0)
+    if other1 or other2:
+        categories = categories.append(pd.Index([OTHER_LABEL], dtype=object))
+        counts1, counts2 = np.append(counts1, other1), np.append(counts2, other2)
+    expected = counts1 / max(counts1.sum(), 1)
+    actual = counts2 / max(counts2.sum(), 1)
+    shifted = int(np.argmax(np.abs(actual - expected))) if len(categories) else None
+    return {
+        "PSI": psi(expected, actual),
+        "KS": np.nan,
+        "JS Distance": js_distance(expected, actual),
+        "Largest Shift": f"{categories[shifted]}: {expected[shifted]:.1%} → {actual[shifted]:.1%}" if shifted is not None else "",
+    }
+
+
+def drift_level(value):
+    if np.isnan(value):
+        return ""
+    if value < PSI_THRESHOLDS[0]:
+        return "Stable"
+    return "Moderate" if value < PSI_THRESHOLDS[1] else "Major"
+
+
+def drift_report(baseline, current):
+    """Returns a per-column drift report comparing two profiles, using only their value
+    tables: nothing is rescanned, so the cost depends on distinct values, not rows."""
+    rows = []
+    for col in baseline.columns:
+        if col not in current.columns or col not in baseline.value_tables or col not in current.value_tables:
+            continue
+        dtype1, dtype2 = baseline.dtypes[col], current.dtypes[col]
+        non_null1 = baseline.n_rows - baseline.null_counts[col]
+        non_null2 = current.n_rows - current.null_counts[col]
+        if not non_null1 or not non_null2:
+            continue
+        if (is_numeric(dtype1) and is_numeric(dtype2)) or (is_datetime(dtype1) and is_datetime(dtype2)):
+            kind = "Numeric" if is_numeric(dtype1) else "Datetime"
+            label = (lambda value: f"{value:.4g}") if kind == "Numeric" else (lambda value: str(pd.Timestamp(int(value))))
+            table1, table2 = _numeric_table(baseline, col), _numeric_table(current, col)
+            if not len(table1[0]) or not len(table2[0]):
+                # No distribution was kept, e.g. datetimes of a profile saved before they had sketches
+                rows.append({"Column": col, "Type": kind, "PSI": np.nan, "KS": np.nan, "JS Distance": np.nan,
+                             "Largest Shift": "not tracked by the approximate profile", "Drift": ""})
+                continue
+            result = numeric_drift(table1, table2, label)
+        elif not is_numeric(dtype1) and not is_numeric(dtype2):
+            kind = "Categorical"
+            result = categorical_drift(baseline.value_tables[col], current.value_tables[col], non_null1, non_null2)
+        else:
+            continue
+        rows.append({"Column": col, "Type": kind, **result, "Drift": drift_level(result["PSI"])})
+    return pd.DataFrame(rows, columns=DRIFT_COLUMNS)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# Object columns whose distinct/non-null ratio is at most this become categoricals
+CATEGORY_RATIO = 0.5
+# Values inspected when deciding whether an object column holds dates
+DATE_SAMPLE_SIZE = 1000
+# Strings that are neither categorical nor dates use Arrow-backed storage
+STRING_DTYPE = "string[pyarrow]"
+
+
+def is_numeric(dtype):
+    """Returns True for integer and float dtypes of any width, including nullable ones."""
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def is_categorical(dtype):
+    """Returns True for object, category and string dtypes."""
+    return (pd.api.types.is_object_dtype(dtype)
+            or isinstance(dtype, pd.CategoricalDtype)
+            or pd.api.types.is_string_dtype(dtype))
+
+
+def is_datetime(dtype):
+    return pd.api.types.is_datetime64_any_dtype(dtype)
+
+
+def _downcast_integer(series):
+    if series.isna().any() or not len(series):
+        return series
+    downcast = "unsigned" if series.min() >= 0 else "integer"
+    return pd.to_numeric(series, downcast=downcast)
+
+
+def _downcast_float(series):
+    # Only keep float32 when every value survives the round trip unchanged
+    narrowed = series.astype("float32")
+    if np.array_equal(narrowed.to_numpy(dtype="float64"), series.to_numpy(), equal_nan=True):
+        return narrowed
+    return series
+
+
+def _parse_dates(series):
+    """Returns the column parsed as datetimes, or None if it does not look like dates."""
+    sample = series.dropna().head(DATE_SAMPLE_SIZE)
+    if not len(sample) or pd.api.types.infer_dtype(sample, skipna=True) != "string":
+        return None
+    try:
+        pd.to_datetime(sample, format="ISO8601")
+    except (ValueError, TypeError, OverflowError):
+        return None
+    parsed = pd.to_datetime(series, format="ISO8601", errors="coerce")
+    # Reject the conversion if any non-null value failed to parse
+    if parsed.isna().sum() != series.isna().sum():
+        return None
+    return parsed
+
+
+def _convert_strings(series, category_ratio):
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred == "empty":
+        return series
+    if inferred != "string":
+        # Chunked parsing can leave numbers and strings mixed in one column; the
+        # CSV held text, so treat every value as text
+        series = series.where(series.isna(), series.astype(str))
+    parsed = _parse_dates(series)
+    if parsed is not None:
+        return parsed
+    non_null = series.count()
+    if series.nunique(dropna=True) / non_null <= category_ratio:
+        return series.astype("category")
+    return series.astype(STRING_DTYPE)
+
+
+def optimize_dtypes(df, category_ratio=CATEGORY_RATIO):
+    """Downcasts numeric columns and converts string columns to category, Arrow-backed
+    string or datetime dtypes. Columns are converted one at a time to bound peak memory."""
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series.dtype) and isinstance(series.dtype, np.dtype):
+            converted = _downcast_integer(series)
+        elif pd.api.types.is_float_dtype(series.dtype) and series.dtype == np.float64:
+            converted = _downcast_float(series)
+        elif pd.api.types.is_object_dtype(series.dtype):
+            converted = _convert_strings(series, category_ratio)
+        else:
+            continue
+        if converted is not series:
+            df[col] = converted
+    return df
+
+
+def memory_usage(df):
+    """Returns the deep memory footprint of a dataframe in bytes."""
+    return int(df.memory_usage(deep=True, index=True).sum())
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+# Keys of the widget state st.data_editor keeps for a keyed editor
+EDITOR_CHANGES = ["edited_rows", "added_rows", "deleted_rows"]
+
+
+def has_changes(editor_state):
+    """Returns True if a data_editor widget state records any edit."""
+    return any(editor_state.get(change) for change in EDITOR_CHANGES)
+
+
+def editor_delta(original, edited, editor_state):
+    """Returns the cell-level changes between the frame given to st.data_editor and the one
+    it returned, as {column: (removed values, added values)}.
+
+    Only the rows and cells named in the editor state are read, so the cost is proportional
+    to the number of edits rather than the size of the frame.
+    """
+    deleted = sorted(int(pos) for pos in editor_state.get("deleted_rows", []))
+    edited_rows = {int(pos): cells for pos, cells in editor_state.get("edited_rows", {}).items()
+                   if int(pos) not in set(deleted)}
+    delta = {}
+
+    def record(col, removed, added):
+        if col in delta:
+            removed = pd.concat([delta[col][0], removed], ignore_index=True)
+            added = pd.concat([delta[col][1], added], ignore_index=True)
+        delta[col] = (removed, added)
+
+    # Edited cells: the old value leaves the column and the new one joins it
+    for pos, cells in edited_rows.items():
+        label = original.index[pos]
+        for col in cells:
+            record(col, original[col].iloc[[pos]].reset_index(drop=True),
+                   edited[col].loc[[label]].reset_index(drop=True))
+
+    if deleted:
+        rows = original.iloc[deleted]
+        for col in original.columns:
+            record(col, rows[col].reset_index(drop=True), rows[col].iloc[:0])
+
+    added = _added_rows(original, edited, editor_state)
+    for col in added.columns:
+        record(col, added[col].iloc[:0], added[col].reset_index(drop=True))
+
+    return delta
+
+
+def _added_rows(original, edited, editor_state):
+    # The editor returns the kept rows in order followed by the added ones
+    n_kept = len(original) - len(set(editor_state.get("deleted_rows", [])))
+    return edited.iloc[n_kept:]
+
+
+def merge_page_edits(df, positions, page, edited_page, page_state):
+    """Applies the editor changes made to one page of a dataset back to the dataset.
+
+    `positions` are the dataset row positions shown on the page, `page` the frame given
+    to st.data_editor and `edited_page` the one it returned. `df` is never modified, as it
+    may be shared with other sessions: edited columns are copied into a shallow copy of
+    it (copy-on-write per column) and deleting or adding rows builds a new frame. Returns
+    the updated dataset, the equivalent dataset-level editor state and the cell-level
+    delta of the page.
+    """
+    delta = editor_delta(page, edited_page, page_state)
+    deleted = sorted({int(positions[int(pos)]) for pos in page_state.get("deleted_rows", [])})
+    edited_rows = {int(positions[int(pos)]): cells for pos, cells in page_state.get("edited_rows", {}).items()}
+    added = _added_rows(page, edited_page, page_state)
+    state = {"edited_rows": edited_rows, "added_rows": page_state.get("added_rows", []), "deleted_rows": deleted}
+
+    edited_cols = {col for cells in page_state.get("edited_rows", {}).values() for col in cells}
+    if edited_cols:
+        df = df.copy(deep=False)
+        for col in edited_cols:
+            df[col] = df[col].copy()
+    for pos, cells in page_state.get("edited_rows", {}).items():
+        row = int(positions[int(pos)])
+        if row in deleted:
+            continue
+        page_label = page.index[int(pos)]
+        for col in cells:
+            value = edited_page.at[page_label, col]
+            try:
+                df.iloc[row, df.columns.get_loc(col)] = value
+            except (TypeError, ValueError):
+                # The value does not fit the column's dtype (e.g. a new category); widen it
+                df[col] = df[col].astype(object)
+                df.iloc[row, df.columns.get_loc(col)] = value
+
+    if deleted or len(added):
+        keep = np.ones(len(df), dtype=bool)
+        keep[deleted] = False
+        df = pd.concat([df.iloc[keep], added], ignore_index=isinstance(df.index, pd.RangeIndex))
+    return df, state, delta
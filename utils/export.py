@@ -0,0 +1,50 @@
+import gzip
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Label -> (file extension, MIME type) of the formats offered for download
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+# Rows serialised at a time, bounding the size of intermediate strings
+EXPORT_CHUNK_ROWS = 100_000
+# Fast gzip level; higher levels cost much more time for little extra saving on CSV
+GZIP_LEVEL = 1
+
+
+def write_csv(df, out, chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """Writes a dataframe as UTF-8 CSV to a binary file object, chunk by chunk.
+
+    `progress` is called with the fraction of rows written before each chunk.
+    """
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    for start in range(0, max(len(df), 1), chunk_rows):
+        if progress:
+            progress(start / max(len(df), 1))
+        df.iloc[start:start + chunk_rows].to_csv(text, header=start == 0, index=False)
+    text.flush()
+    text.detach()
+
+
+def write_parquet(df, out):
+    """Writes a dataframe to a binary file object as zstd-compressed Parquet."""
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), out, compression="zstd")
+
+
+def export_bytes(df, fmt, progress=None):
+    """Returns the dataframe serialised in one of EXPORT_FORMATS."""
+    buffer = io.BytesIO()
+    if fmt == "CSV":
+        write_csv(df, buffer, progress=progress)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as out:
+            write_csv(df, out, progress=progress)
+    elif fmt == "Parquet":
+        write_parquet(df, buffer)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return buffer.getvalue()
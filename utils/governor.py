@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from pathlib import Path
+
+from utils.storage import STORE_SUFFIX, read_dataset, write_dataset
+from utils.store import shared_frame
+
+# Memory the frames of one session may hold, overridable with EDA_SESSION_MB
+SESSION_BUDGET_BYTES = int(os.environ.get("EDA_SESSION_MB", 2048)) * 1024 * 1024
+# Memory the frames of all sessions in this process may hold, overridable with EDA_MEMORY_MB
+GLOBAL_BUDGET_BYTES = int(os.environ.get("EDA_MEMORY_MB", 8192)) * 1024 * 1024
+# Where edited frames are spilled, overridable with EDA_SPILL_DIR
+SPILL_DIR = Path(os.environ.get("EDA_SPILL_DIR", Path(tempfile.gettempdir()) / "eda-spill"))
+
+
+class MemoryGovernor:
+    """Keeps the frames held by sessions within a per-session and a process-wide budget.
+
+    Datasets a page is not showing are unloaded least recently used first. A dataset
+    whose stored columnar copy still matches is simply dropped; an edited one is first
+    written to a spill file. The frame is read back from the file when it is next used.
+    """
+
+    def __init__(self, session_budget=SESSION_BUDGET_BYTES, global_budget=GLOBAL_BUDGET_BYTES, spill_dir=SPILL_DIR):
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.spill_dir = Path(spill_dir)
+        # Dataset -> owning session; entries vanish with the datasets
+        self._owners = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def use(self, session, datasets, active=()):
+        """Registers a session's datasets, marks `active` (the ones being shown) as just used
+        and unloads idle datasets until both budgets are met."""
+        now = time.monotonic()
+        active = list(active)
+        with self._lock:
+            for dataset in datasets:
+                self._owners[dataset] = session
+            for dataset in active:
+                dataset.last_used = now
+            own = [dataset for dataset, owner in self._owners.items() if owner == session]
+            self._evict(own, self.session_budget, active)
+            self._evict(list(self._owners.keys()), self.global_budget, active)
+
+    def _evict(self, datasets, budget, keep):
+        loaded = [dataset for dataset in datasets if dataset.loaded]
+        # A frame shared by several datasets is counted once and only freed with its last holder
+        holders = {}
+        for dataset in loaded:
+            holders.setdefault(id(dataset.df), []).append(dataset)
+        total = sum(group[0].memory_bytes() for group in holders.values())
+        for dataset in sorted(loaded, key=lambda item: item.last_used):
+            if total <= budget:
+                break
+            if any(dataset is kept for kept in keep):
+                continue
+            group, size = holders[id(dataset.df)], dataset.memory_bytes()
+            self.spill(dataset)
+            group.remove(dataset)
+            if not group:
+                total -= size
+
+    def spill(self, dataset):
+        """Unloads a dataset's frame, writing it to a spill file unless its stored copy matches."""
+        if dataset.path is not None and Path(dataset.path).exists():
+            source = Path(dataset.path)
+        else:
+            if dataset.spill_path is None:
+                path = self.spill_dir / self._owners.get(dataset, "detached") / f"{dataset.profiler.fingerprint}{STORE_SUFFIX}"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                write_dataset(dataset.df, path, name=dataset.name)
+                dataset.spill_path = path
+            source = Path(dataset.spill_path)
+        # Unedited frames come back as the instance other sessions may share
+        dataset.profiler.unload(lambda: shared_frame(source) if source == dataset.path else read_dataset(source))
+
+    def resident_bytes(self, session=None):
+        """Returns the memory held by the loaded frames of one session, or of all sessions."""
+        with self._lock:
+            return sum(dataset.memory_bytes() for dataset, owner in self._owners.items()
+                       if dataset.loaded and (session is None or owner == session))
+
+    def release(self, session):
+        """Forgets a session's datasets and deletes its spill files (e.g. on logout)."""
+        with self._lock:
+            for dataset, owner in list(self._owners.items()):
+                if owner == session:
+                    del self._owners[dataset]
+        shutil.rmtree(self.spill_dir / session, ignore_errors=True)
+
+
+# Shared by every session running in this server process
+governor = MemoryGovernor()
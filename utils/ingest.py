@@ -0,0 +1,202 @@
+import hashlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import pyarrow as pa
+
+from utils.cache import derive_fingerprint, profile_cache
+from utils.csv_reader import (CSV_ENGINE, CSVParseError, ParseStats, arrow_chunks, as_source, csv_sources, pandas_chunks,
+                              sample_schema)
+from utils.dtypes import optimize_dtypes
+from utils.metrics import metrics
+from utils.profiling import ProfileBuilder, build_profile
+from utils.sketches import ApproximateProfileBuilder, build_approximate_profile
+
+# Bytes copied per read when persisting an upload
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+# Rows parsed and profiled per chunk
+PARSE_CHUNK_ROWS = 250_000
+# Files at least this large are profiled with sketches, overridable with EDA_APPROX_MB
+APPROXIMATE_BYTES = int(os.environ.get("EDA_APPROX_MB", 1024)) * 1024 * 1024
+# Uploads ingested at the same time, overridable with EDA_UPLOAD_WORKERS
+UPLOAD_WORKERS = int(os.environ.get("EDA_UPLOAD_WORKERS", min(os.cpu_count() or 1, 4)))
+# Seconds between progress reports while uploads are being ingested
+PROGRESS_INTERVAL = 0.1
+
+
+def save_upload(uploaded_file, path, progress=None):
+    """Writes the raw bytes of an uploaded file to disk in fixed-size chunks.
+
+    `progress` is called with (bytes_written, total_bytes) after each chunk.
+    Returns the number of bytes written and a content hash of them.
+    """
+    total = getattr(uploaded_file, "size", None)
+    written = 0
+    digest = hashlib.blake2b(digest_size=16)
+    uploaded_file.seek(0)
+    with open(path, "wb") as out:
+        while True:
+            block = uploaded_file.read(COPY_CHUNK_BYTES)
+            if not block:
+                break
+            out.write(block)
+            digest.update(block)
+            written += len(block)
+            if progress:
+                progress(written, total or written)
+    uploaded_file.seek(0)
+    return written, digest.hexdigest()
+
+
+def _assemble(chunks, builder, optimize):
+    """Profiles parsed chunks as they arrive and returns the assembled frame and Profile."""
+    parts = []
+    for chunk in chunks:
+        builder.add(chunk)
+        parts.append(chunk)
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    del parts
+    if optimize:
+        optimize_dtypes(df)
+    return df, builder.result(df)
+
+
+def read_csv_chunked(path, progress=None, chunk_rows=PARSE_CHUNK_ROWS, optimize=True, approximate=None,
+                     engine=CSV_ENGINE, column_types=None, stats=None):
+    """Parses a CSV file or CSVSource chunk by chunk, profiling each chunk as it is read.
+    Compressed files are decompressed as they are parsed.
+
+    The "arrow" engine parses on Arrow's thread pool with column types inferred from a
+    sample of the file; files Arrow rejects are parsed by pandas instead, and a file
+    neither can parse raises CSVParseError. `column_types` forces one of COLUMN_TYPES
+    on columns. `stats`, a ParseStats, receives the reader used and its throughput.
+
+    With `optimize`, the assembled frame is shrunk with optimize_dtypes before the
+    per-chunk statistics are merged. `approximate` selects sketch-based profiling;
+    by default it is used for files of at least APPROXIMATE_BYTES once decompressed.
+
+    `progress` is called with (bytes_consumed, total_bytes) of the file on disk after each chunk.
+    Returns the assembled dataframe and its Profile.
+    """
+    source = as_source(path)
+    if approximate is None:
+        approximate = source.uncompressed_size() >= APPROXIMATE_BYTES
+    stats = stats if stats is not None else ParseStats()
+    stats.compression, stats.compressed_bytes = source.compression, source.size
+    start = time.perf_counter()
+    result = None
+    if engine == "arrow":
+        try:
+            builder = ApproximateProfileBuilder() if approximate else ProfileBuilder()
+            result = _assemble(arrow_chunks(source, column_types, progress, stats), builder, optimize)
+            stats.engine, stats.threads = "arrow", pa.cpu_count()
+        except pa.ArrowException as e:
+            stats.fallback = str(e)
+    if result is None:
+        try:
+            builder = ApproximateProfileBuilder() if approximate else ProfileBuilder()
+            result = _assemble(pandas_chunks(source, chunk_rows, column_types, progress, stats), builder, optimize)
+            stats.engine, stats.threads = "pandas", 1
+        except ValueError as e:
+            reason = f"{e} (the Arrow reader also failed: {stats.fallback})" if stats.fallback else str(e)
+            raise CSVParseError(f"Not a readable CSV file: {reason}") from e
+    stats.seconds = time.perf_counter() - start
+    metrics.observe("parse", {"engine": stats.engine}, stats.seconds)
+    return result
+
+
+def ingest_upload(uploaded_file, store, user, name=None, progress=None, column_types=None, session=None):
+    """Stages an upload, then stores each CSV in it (the file itself, decompressed if it is
+    gzip, bz2 or zstd compressed, or every CSV in a zip archive) in a content-addressed
+    DatasetStore and records it as one of the user's files. A CSV is stored under the hash
+    of the upload's bytes, of its member name in an archive and of any column types forced
+    on it; `column_types` maps dataset names (as csv_sources names them) to those types.
+    `session` is recorded as holding the user's files.
+
+    Content that is already stored is neither parsed nor written again: the shared frame
+    is reused and its profile comes from the cache. CSVs that arrived compressed are
+    stored compressed. `progress` is called with (fraction, stage) as the work advances.
+    Returns (dataset name, dataframe, Profile, content hash, object path, ParseStats) for
+    each CSV; the content hash identifies the parsed frame without hashing it.
+    """
+    name = name or uploaded_file.name
+    staging_path = store.staging_path()
+
+    def report(stage, start, span):
+        def callback(done, total):
+            if progress:
+                progress(start + span * (done / total if total else 1.0), stage)
+        return callback
+
+    results = []
+    try:
+        _, upload_hash = save_upload(uploaded_file, staging_path, report("Saving", 0.0, 0.4))
+        sources = csv_sources(staging_path, name)
+        span = 0.55 / len(sources)
+        for i, (dataset_name, source) in enumerate(sources):
+            stats = ParseStats()
+            content_hash = upload_hash
+            if source.member is not None:
+                content_hash = derive_fingerprint(content_hash, {"member": source.member})
+            forced = {col: kind for col, kind in (column_types or {}).get(dataset_name, {}).items() if kind != "Auto"}
+            if forced:
+                content_hash = derive_fingerprint(content_hash, forced)
+            approximate = source.uncompressed_size() >= APPROXIMATE_BYTES
+            key = (content_hash, "approximate_profile" if approximate else "profile")
+            # Concurrent uploads of the same content wait here and then reuse the first one's work
+            with store.lock(content_hash):
+                if store.has(content_hash):
+                    if progress:
+                        progress(0.4 + span * (i + 0.5), "Reusing")
+                    df = store.open(content_hash)
+                    try:
+                        stats.ambiguous = sample_schema(source)[2]
+                    except (pa.ArrowException, ValueError):
+                        pass
+                    builder = build_approximate_profile if approximate else build_profile
+                    profile = profile_cache.get_or_compute(key, lambda: builder(df))
+                else:
+                    df, profile = read_csv_chunked(source, report("Parsing", 0.4 + span * i, span), approximate=approximate,
+                                                   column_types=forced, stats=stats)
+                    store.put(content_hash, df, name=dataset_name, compressed=source.compression is not None)
+                    profile_cache.put(key, profile)
+                store.add_ref(user, dataset_name, content_hash, approximate, session)
+            results.append((dataset_name, df, profile, content_hash, store.object_path(content_hash), stats))
+    finally:
+        staging_path.unlink(missing_ok=True)
+    if progress:
+        progress(1.0, "Stored")
+    return results
+
+
+def ingest_uploads(uploaded_files, store, user, progress=None, workers=UPLOAD_WORKERS, column_types=None, session=None):
+    """Ingests several uploads concurrently on a bounded thread pool.
+
+    Parsing, profiling and writing run on the workers, while `progress` is called with
+    (name, fraction, stage) from the calling thread, so it may update Streamlit elements.
+    Yields (uploaded_file, results, error) as each file finishes, where results is what
+    ingest_upload returns and error the exception it raised, if any. `column_types` maps
+    dataset names to the column types forced on them, and `session` holds the stored files.
+    """
+    reported = {}
+
+    def run(uploaded_file):
+        def report(fraction, stage):
+            reported[uploaded_file.name] = (fraction, stage)
+        return ingest_upload(uploaded_file, store, user, progress=report, column_types=column_types, session=session)
+
+    with ThreadPoolExecutor(max(min(workers, len(uploaded_files)), 1)) as pool:
+        futures = {pool.submit(run, uploaded_file): uploaded_file for uploaded_file in uploaded_files}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            if progress:
+                for name, (fraction, stage) in list(reported.items()):
+                    progress(name, fraction, stage)
+            for future in done:
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
@@ -0,0 +1,151 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from utils.cache import profile_cache
+
+# Threads running background jobs, overridable with EDA_JOB_WORKERS
+JOB_WORKERS = int(os.environ.get("EDA_JOB_WORKERS", min(os.cpu_count() or 1, 4)))
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's computation when the job has been cancelled."""
+
+
+class Job:
+    """A computation running on the job pool, identified by the cache key of its result."""
+
+    def __init__(self, key):
+        self.key = key
+        self.future = Future()
+        self.progress = 0.0
+        self.stage = "Queued"
+        self.waiters = 0
+        self._cancel = threading.Event()
+
+    @classmethod
+    def completed(cls, key, value):
+        """Returns a finished job holding a result that is already known."""
+        job = cls(key)
+        job.progress, job.stage = 1.0, "Done"
+        job.future.set_result(value)
+        return job
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set() or self.future.cancelled()
+
+    @property
+    def error(self):
+        """Returns the exception the computation raised, if it finished with one."""
+        if not self.done or self.cancelled:
+            return None
+        error = self.future.exception()
+        return None if isinstance(error, JobCancelled) else error
+
+    def result(self):
+        return self.future.result()
+
+    def report(self, fraction, stage=None):
+        """Records progress. Long computations call this between steps; it raises
+        JobCancelled once the job is cancelled, which stops the computation there."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if stage is not None:
+            self.stage = stage
+
+    def cancel(self):
+        self._cancel.set()
+        self.future.cancel()
+
+
+class JobManager:
+    """Runs expensive computations off the script thread.
+
+    Jobs are deduplicated by key: submitting a key that is already running returns the
+    running job, and a key whose result is in the profile cache returns a finished job.
+    Results are stored in the profile cache, so synchronous callers share them.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, cache=profile_cache):
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="eda-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, compute):
+        """Returns the job computing `compute(report)` for key, starting it if needed.
+
+        `compute` receives the job's report(fraction, stage) callback.
+        """
+        missing = object()
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.cancelled:
+                return job
+            cached = self.cache.get(key, missing)
+            if cached is not missing:
+                return Job.completed(key, cached)
+            job = Job(key)
+            self._jobs[key] = job
+        self._pool.submit(self._run, job, compute)
+        return job
+
+    def _run(self, job, compute):
+        if not job.future.set_running_or_notify_cancel():
+            return
+        try:
+            job.report(0.0, "Running")
+            value = self.cache.put(job.key, compute(job.report))
+            job.progress, job.stage = 1.0, "Done"
+            job.future.set_result(value)
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def assign(self, slots, slot, job):
+        """Makes `job` the one a session is waiting on in a named slot (e.g. the chart it
+        feeds). The job previously in the slot is released and cancelled if no other
+        slot still waits on it."""
+        previous = slots.get(slot)
+        if previous is job:
+            return job
+        with self._lock:
+            job.waiters += 1
+            slots[slot] = job
+            if previous is not None:
+                previous.waiters -= 1
+                if previous.waiters <= 0 and not previous.done:
+                    previous.cancel()
+                    if self._jobs.get(previous.key) is previous:
+                        del self._jobs[previous.key]
+        return job
+
+    def release(self, slots, slot):
+        """Stops waiting on the job in a slot, cancelling it if nobody else waits on it."""
+        job = slots.pop(slot, None)
+        if job is None:
+            return
+        with self._lock:
+            job.waiters -= 1
+            if job.waiters <= 0 and not job.done:
+                job.cancel()
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def running(self):
+        """Returns the jobs that are queued or running."""
+        with self._lock:
+            return list(self._jobs.values())
+
+
+# Shared by every session running in this server process
+job_manager = JobManager()
@@ -0,0 +1,229 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Prometheus text file rewritten with the current metrics, set with EDA_METRICS_FILE
+METRICS_FILE = os.environ.get("EDA_METRICS_FILE")
+# JSON-lines log receiving one record per finished rerun, set with EDA_METRICS_LOG
+METRICS_LOG = os.environ.get("EDA_METRICS_LOG")
+# Minimum seconds between rewrites of the metrics file
+FLUSH_INTERVAL = 10.0
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_local = threading.local()
+
+
+def resident_bytes():
+    """Returns the resident memory of this process in bytes, or 0 where it cannot be read.
+    The whole process is measured, so concurrent sessions show up in each other's spans."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus layout."""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+class MetricsRegistry:
+    """Process-wide latency histograms and memory totals, exported as Prometheus text."""
+
+    def __init__(self, path=METRICS_FILE, log_path=METRICS_LOG):
+        self.path = path
+        self.log_path = log_path
+        self._histograms = {}
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._flushed = 0.0
+
+    def observe(self, metric, labels, seconds, memory=0):
+        """Records one timing (and resident memory change in bytes) of a labelled metric."""
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._histograms.setdefault(key, Histogram()).observe(seconds)
+            self._memory[key] = self._memory.get(key, 0) + memory
+
+    def prometheus_text(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            memory = dict(self._memory)
+        for metric in sorted({metric for metric, _ in self._histograms}):
+            lines.append(f"# TYPE eda_{metric}_seconds histogram")
+            for (name, labels), histogram in items:
+                if name != metric:
+                    continue
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                sep = "," if label_text else ""
+                for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+                    lines.append(f'eda_{metric}_seconds_bucket{{{label_text}{sep}le="{bound}"}} {count}')
+                lines.append(f'eda_{metric}_seconds_bucket{{{label_text}{sep}le="+Inf"}} {histogram.count}')
+                lines.append(f"eda_{metric}_seconds_sum{{{label_text}}} {histogram.sum:.6f}")
+                lines.append(f"eda_{metric}_seconds_count{{{label_text}}} {histogram.count}")
+            # Net change in resident memory summed over the observations
+            lines.append(f"# TYPE eda_{metric}_memory_bytes gauge")
+            for (name, labels), _ in items:
+                if name == metric:
+                    label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                    lines.append(f"eda_{metric}_memory_bytes{{{label_text}}} {memory[(name, labels)]}")
+        lines.append("# TYPE eda_process_resident_bytes gauge")
+        lines.append(f"eda_process_resident_bytes {resident_bytes()}")
+        return "\n".join(lines) + "\n"
+
+    def log(self, record):
+        """Appends a record to the JSON-lines log and rewrites the metrics file if due."""
+        if self.log_path:
+            with self._lock, open(self.log_path, "a") as out:
+                out.write(json.dumps(record) + "\n")
+        if self.path and time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Writes the Prometheus text file atomically."""
+        if not self.path:
+            return
+        partial = f"{self.path}.part"
+        with open(partial, "w") as out:
+            out.write(self.prometheus_text())
+        os.replace(partial, self.path)
+        self._flushed = time.monotonic()
+
+
+metrics = MetricsRegistry()
+
+
+class RerunTrace:
+    """Timings of one run of a page script: consecutive stages and the spans within them."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started_at = time.time()
+        self.stages = []
+        self.spans = []
+        self.finished = False
+        self._start = self._last = time.perf_counter()
+        self._stage = None
+
+    def touch(self):
+        self._last = time.perf_counter()
+
+    def stage(self, name):
+        """Ends the current stage and starts one called `name`."""
+        self._close_stage()
+        self.touch()
+        self._stage = (name, self._last, resident_bytes())
+
+    def _close_stage(self):
+        if self._stage is None:
+            return
+        name, start, rss = self._stage
+        end = self._last if self.finished else time.perf_counter()
+        self.stages.append({"stage": name, "seconds": max(end - start, 0.0), "memory": resident_bytes() - rss})
+        self._stage = None
+        self._last = max(self._last, end)
+
+    def finish(self, interrupted=False):
+        """Closes the trace and records its stages; returns the trace. An interrupted run
+        (st.stop, st.rerun) is closed later and ends at its last recorded activity."""
+        if not self.finished:
+            if not interrupted:
+                self.touch()
+            self.finished = True
+            self._close_stage()
+            for stage in self.stages:
+                metrics.observe("stage", {"page": self.page, "stage": stage["stage"]}, stage["seconds"], stage["memory"])
+            metrics.observe("rerun", {"page": self.page}, self.seconds, self.memory)
+            metrics.log(self.to_dict())
+            if current_trace() is self:
+                _local.trace = None
+        return self
+
+    @property
+    def seconds(self):
+        return self._last - self._start
+
+    @property
+    def memory(self):
+        return sum(stage["memory"] for stage in self.stages)
+
+    def to_dict(self):
+        return {"page": self.page, "started_at": self.started_at, "seconds": self.seconds,
+                "stages": self.stages, "spans": self.spans}
+
+
+def begin_trace(page):
+    """Starts tracing a page run on this thread and returns the trace."""
+    _local.trace = RerunTrace(page)
+    return _local.trace
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+def stage(name):
+    """Marks the start of the next stage of the page run traced on this thread."""
+    trace = current_trace()
+    if trace is not None:
+        trace.stage(name)
+
+
+@contextmanager
+def span(name):
+    """Times a block, recording it in the latency histograms and in the page run traced on
+    this thread, if any (background jobs only feed the histograms)."""
+    start, rss = time.perf_counter(), resident_bytes()
+    try:
+        yield
+    finally:
+        seconds, memory = time.perf_counter() - start, resident_bytes() - rss
+        metrics.observe("span", {"span": name}, seconds, memory)
+        trace = current_trace()
+        if trace is not None:
+            trace.spans.append({"span": name, "seconds": seconds, "memory": memory})
+            trace.touch()
+
+
+def traced(name):
+    """Decorator timing every call of a function as a span called `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument(prefix, attrs):
+    """Class decorator timing the named methods and properties of a class as spans named
+    `prefix.<attribute>`. Only name heavy ones: each span reads /proc twice."""
+    def decorate(cls):
+        for attr in attrs:
+            value = vars(cls)[attr]
+            if isinstance(value, property):
+                setattr(cls, attr, property(traced(f"{prefix}.{attr}")(value.fget), value.fset, value.fdel, value.__doc__))
+            else:
+                setattr(cls, attr, traced(f"{prefix}.{attr}")(value))
+        return cls
+    return decorate
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+# Datasets with more rows than this open in the paginated editor by default
+WINDOW_THRESHOLD_ROWS = 10_000
+# Rows per page offered by the paginated editor
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def _matches(series, text):
+    """Returns a boolean mask of the values whose text contains `text`, ignoring case."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Match each category once and look the result up by code
+        matched = series.cat.categories.astype(str).str.contains(text, case=False, regex=False)
+        codes = series.cat.codes.to_numpy()
+        return np.where(codes >= 0, np.asarray(matched)[codes], False)
+    return series.astype(str).str.contains(text, case=False, regex=False, na=False).to_numpy(dtype=bool)
+
+
+def view_positions(df, sort_by=None, ascending=True, filter_col=None, filter_text=""):
+    """Returns the row positions of df after an optional substring filter and stable sort.
+
+    Missing values sort last in either direction.
+    """
+    positions = np.arange(len(df))
+    if filter_col is not None and filter_text:
+        positions = positions[_matches(df[filter_col], filter_text)]
+    if sort_by is not None:
+        values = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+def page_count(n_rows, page_size):
+    return max((n_rows + page_size - 1) // page_size, 1)
+
+
+def page_positions(positions, page, page_size):
+    """Returns the positions shown on a 1-based page of a view."""
+    start = (page - 1) * page_size
+    return positions[start:start + page_size]
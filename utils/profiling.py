@@ -0,0 +1,459 @@
+import numpy as np
+import pandas as pd
+
+from utils.dtypes import is_datetime, is_numeric
+
+# Number of most frequent values kept per column
+TOP_K = 10
+# Quantiles reported in the summary statistics table
+QUANTILES = (0.25, 0.5, 0.75)
+# Statistics kept for each numeric column
+STATS_COLUMNS = ["count", "null", "sum", "mean", "var", "std", "min", *(f"{q:.0%}" for q in QUANTILES), "max"]
+# Numeric columns are sorted in blocks of this many columns to bound peak memory
+BLOCK_SIZE = 16
+
+
+class Profile:
+    """Column statistics for a dataset, computed once and read by the pages."""
+
+    def __init__(self, n_rows, columns, dtypes, null_counts, distinct_counts,
+                 numeric_stats, top_values, approximate=False, error_bounds=None, value_tables=None):
+        self.n_rows = n_rows
+        self.columns = columns
+        self.dtypes = dtypes
+        self.null_counts = null_counts
+        self.distinct_counts = distinct_counts
+        self.numeric_stats = numeric_stats
+        self.top_values = top_values
+        # Approximate profiles carry the error bounds of their sketches
+        self.approximate = approximate
+        self.error_bounds = error_bounds or {}
+        # Exact profiles keep every column's full value counts so edits can be applied
+        # without rescanning: (sorted values, counts) for numeric columns, a Series otherwise.
+        # Approximate profiles hold the KLL items and weights and the heavy-hitter counts instead
+        self.value_tables = value_tables or {}
+
+    @property
+    def n_cols(self):
+        return len(self.columns)
+
+    @property
+    def total_missing(self):
+        return int(self.null_counts.sum())
+
+    @property
+    def numeric_columns(self):
+        return list(self.numeric_stats.index)
+
+    def summary_stats(self):
+        """Returns summary statistics in the layout of DataFrame.describe()."""
+        if len(self.numeric_stats):
+            stats = self.numeric_stats[["count", "mean", "std", "min", "25%", "50%", "75%", "max"]]
+            return stats.T
+        # Mirror describe() on frames without numeric columns
+        rows = {}
+        for col in self.columns:
+            top = self.top_values[col]
+            rows[col] = {
+                "count": self.n_rows - self.null_counts[col],
+                "unique": self.distinct_counts[col],
+                "top": top.index[0] if len(top) else np.nan,
+                "freq": top.iloc[0] if len(top) else np.nan,
+            }
+        return pd.DataFrame(rows, index=["count", "unique", "top", "freq"], dtype=object)
+
+    def missing_values(self):
+        """Returns the count and percentage of missing values for columns that have any."""
+        missing_percent = (self.null_counts / self.n_rows) * 100 if self.n_rows else self.null_counts * 0.0
+        missing_df = pd.DataFrame({
+            "Missing Count": self.null_counts,
+            "Missing Percent": missing_percent
+        })
+        return missing_df[missing_df["Missing Count"] > 0]
+
+    def value_counts(self, col, n=TOP_K):
+        """Returns the n most frequent non-null values of a column."""
+        return self.top_values[col].head(n)
+
+    def to_dict(self):
+        """Returns the profile as JSON-serialisable data: shape, then per column its dtype,
+        null and distinct counts, numeric statistics and most frequent values."""
+        columns = []
+        for col in self.columns:
+            entry = {
+                "name": str(col),
+                "dtype": str(self.dtypes[col]),
+                "nulls": int(self.null_counts[col]),
+                "distinct": int(self.distinct_counts[col]),
+                "top_values": [{"value": json_value(value), "count": int(count)} for value, count in self.top_values[col].items()],
+            }
+            if col in self.numeric_stats.index:
+                entry["stats"] = {stat: json_value(value) for stat, value in self.numeric_stats.loc[col].items()}
+            columns.append(entry)
+        return {
+            "rows": int(self.n_rows),
+            "columns": columns,
+            "approximate": self.approximate,
+            "error_bounds": {name: {str(col): json_value(v) for col, v in bound.items()} if isinstance(bound, (dict, pd.Series)) else json_value(bound)
+                             for name, bound in self.error_bounds.items()},
+        }
+
+
+def json_value(value):
+    """Returns a numpy or pandas scalar as a JSON-serialisable Python value."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    return value
+
+
+def stats_frame(numeric_rows):
+    """Returns per-column numeric statistics as a frame with one row per column."""
+    return pd.DataFrame.from_dict(numeric_rows, orient="index", columns=STATS_COLUMNS, dtype="float64")
+
+
+def _run_lengths(ordered):
+    """Returns the distinct values of a sorted array without NaNs and their counts."""
+    if not len(ordered):
+        return ordered[:0], np.zeros(0, dtype="int64")
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    return ordered[starts], np.diff(np.r_[starts, len(ordered)])
+
+
+def _top_k(values, counts, k):
+    order = np.argsort(-counts, kind="stable")[:k]
+    order = order[counts[order] > 0]
+    return pd.Series(counts[order], index=values[order])
+
+
+def _quantiles(values, counts, qs):
+    """Returns linearly interpolated quantiles from sorted distinct values and their counts."""
+    n = counts.sum()
+    if n == 0:
+        return np.full(len(qs), np.nan)
+    cum = np.cumsum(counts)
+    pos = (n - 1) * np.asarray(qs)
+    lo = np.floor(pos)
+    value_lo = values[np.searchsorted(cum, lo, side="right")]
+    value_hi = values[np.searchsorted(cum, np.ceil(pos), side="right")]
+    return value_lo + (value_hi - value_lo) * (pos - lo)
+
+
+def block_moments(block):
+    """Returns per-column null counts, counts, sums, means and sums of squared deviations
+    of a 2D float block."""
+    nan_mask = np.isnan(block)
+    null_counts = nan_mask.sum(axis=0)
+    counts = block.shape[0] - null_counts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sums = np.where(nan_mask, 0.0, block).sum(axis=0)
+        means = np.where(counts > 0, sums / counts, 0.0)
+        centred = np.where(nan_mask, 0.0, block - means)
+        m2 = (centred * centred).sum(axis=0)
+    return null_counts, counts, sums, means, m2
+
+
+def combine_moments(count, mean, m2, other_count, other_mean, other_m2):
+    """Merges two (count, mean, m2) summaries with Chan et al.'s pairwise update."""
+    n = count + other_count
+    if not other_count:
+        return count, mean, m2
+    delta = other_mean - mean
+    return n, mean + delta * other_count / n, m2 + other_m2 + delta * delta * count * other_count / n
+
+
+def remove_moments(count, mean, m2, other_count, other_mean, other_m2):
+    """Inverse of combine_moments: removes a (count, mean, m2) summary from another."""
+    n = count - other_count
+    if not other_count:
+        return count, mean, m2
+    if n <= 0:
+        return 0, 0.0, 0.0
+    rest_mean = (count * mean - other_count * other_mean) / n
+    delta = other_mean - rest_mean
+    return n, rest_mean, max(m2 - other_m2 - delta * delta * n * other_count / count, 0.0)
+
+
+def _numeric_block(block):
+    """Returns partial statistics for each column of a 2D float block."""
+    null_counts, counts, sums, means, m2 = block_moments(block)
+
+    # NaNs sort to the end, so the first `count` rows of each column are its values
+    ordered = np.sort(block, axis=0)
+    parts = []
+    for j in range(block.shape[1]):
+        values, value_counts = _run_lengths(ordered[:counts[j], j])
+        parts.append({
+            "count": int(counts[j]),
+            "null": int(null_counts[j]),
+            "sum": sums[j],
+            "mean": means[j],
+            "m2": m2[j],
+            "values": values,
+            "counts": value_counts,
+        })
+    return parts
+
+
+def table_part(values, counts, nulls):
+    """Returns the partial statistics of a numeric column from its sorted distinct values
+    and their counts, as computed by a compute backend."""
+    count = int(counts.sum())
+    total = float((values * counts).sum()) if count else 0.0
+    mean = total / count if count else 0.0
+    m2 = float((counts * (values - mean) ** 2).sum()) if count else 0.0
+    return {"count": count, "null": int(nulls), "sum": total, "mean": mean, "m2": m2,
+            "values": values, "counts": counts}
+
+
+def _categorical_column(series):
+    """Returns partial statistics for a non-numeric column."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], minlength=len(uniques))
+    # Datetimes keep their dtype; boxing every distinct timestamp as an object is slow
+    index = pd.Index(uniques) if is_datetime(uniques.dtype) else pd.Index(np.asarray(uniques), dtype=object)
+    return {
+        "null": int(len(codes) - valid.sum()),
+        "value_counts": pd.Series(counts, index=index),
+    }
+
+
+def _merge_numeric(parts, qs):
+    """Combines per-chunk numeric partials into final column statistics."""
+    count, mean, m2, total, nulls = 0, 0.0, 0.0, 0.0, 0
+    for part in parts:
+        count, mean, m2 = combine_moments(count, mean, m2, part["count"], part["mean"], part["m2"])
+        total += part["sum"]
+        nulls += part["null"]
+
+    values = np.concatenate([part["values"] for part in parts])
+    counts = np.concatenate([part["counts"] for part in parts])
+    if len(parts) > 1 and len(values):
+        order = np.argsort(values, kind="stable")
+        values, counts = values[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        values, counts = values[starts], np.add.reduceat(counts, starts)
+
+    return _numeric_stats(count, mean, m2, total, nulls, values, counts, qs), values, counts
+
+
+def _numeric_stats(count, mean, m2, total, nulls, values, counts, qs=QUANTILES):
+    """Returns the statistics row of a numeric column from its moments and value table."""
+    var = m2 / (count - 1) if count > 1 else np.nan
+    stats = {
+        "count": float(count),
+        "null": float(nulls),
+        "sum": total,
+        "mean": mean if count else np.nan,
+        "var": var,
+        "std": np.sqrt(var),
+        "min": values[0] if count else np.nan,
+        "max": values[-1] if count else np.nan,
+    }
+    for q, value in zip(qs, _quantiles(values, counts, qs)):
+        stats[f"{q:.0%}"] = value
+    return stats
+
+
+def _numeric_top(values, counts, k, dtype):
+    top = _top_k(values, counts, k)
+    if pd.api.types.is_integer_dtype(dtype):
+        top.index = top.index.astype(dtype)
+    return top
+
+
+def _categorical_top(table, k):
+    counts = table.to_numpy()
+    order = np.argsort(-counts, kind="stable")[:k]
+    order = order[counts[order] > 0]
+    return pd.Series(counts[order], index=table.index[order].astype(object))
+
+
+def _merge_categorical(parts):
+    nulls = sum(part["null"] for part in parts)
+    if len(parts) == 1:
+        return nulls, parts[0]["value_counts"]
+    merged = pd.concat([part["value_counts"] for part in parts]).groupby(level=0, sort=False).sum()
+    return nulls, merged
+
+
+class ProfileBuilder:
+    """Accumulates partial statistics chunk by chunk and merges them into a Profile."""
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self.n_rows = 0
+        self.columns = None
+        self.dtypes = None
+        self._parts = {}
+
+    def add(self, chunk, parts=None):
+        """Profiles one chunk of rows; numeric columns are sorted one block at a time.
+
+        `parts` holds partial statistics computed elsewhere (e.g. by a compute backend) as
+        {column: ("numeric" | "categorical", partial)}; those columns are not scanned again.
+        """
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.dtypes = chunk.dtypes
+            self._parts = {col: [] for col in self.columns}
+        self.n_rows += len(chunk)
+        parts = parts or {}
+        for col, part in parts.items():
+            self._parts[col].append(part)
+
+        numeric = [col for col in self.columns if col not in parts and is_numeric(chunk.dtypes[col])]
+        for start in range(0, len(numeric), BLOCK_SIZE):
+            names = numeric[start:start + BLOCK_SIZE]
+            block = chunk[names].to_numpy(dtype="float64", na_value=np.nan)
+            for col, part in zip(names, _numeric_block(block)):
+                self._parts[col].append(("numeric", part))
+        for col in self.columns:
+            if col not in numeric and col not in parts:
+                self._parts[col].append(("categorical", _categorical_column(chunk[col])))
+        return self
+
+    def result(self, df=None):
+        """Returns the merged Profile. Pass the assembled frame so that columns whose dtype
+        changed between chunks can be re-profiled against their final dtype."""
+        columns = self.columns or (list(df.columns) if df is not None else [])
+        dtypes = df.dtypes if df is not None else self.dtypes
+        null_counts = pd.Series(0, index=columns, dtype="int64")
+        distinct_counts = pd.Series(0, index=columns, dtype="int64")
+        numeric_rows = {}
+        top_values = {}
+        value_tables = {}
+
+        for col in columns:
+            parts = self._parts.get(col, [])
+            kinds = {kind for kind, _ in parts}
+            expected = "numeric" if is_numeric(dtypes[col]) else "categorical"
+            if kinds != {expected} and df is not None:
+                parts = (_numeric_block(df[[col]].to_numpy(dtype="float64", na_value=np.nan))
+                         if expected == "numeric" else [_categorical_column(df[col])])
+            else:
+                parts = [part for _, part in parts]
+
+            if expected == "numeric":
+                stats, values, counts = _merge_numeric(parts, QUANTILES)
+                numeric_rows[col] = stats
+                null_counts[col] = stats["null"]
+                distinct_counts[col] = len(values)
+                top_values[col] = _numeric_top(values, counts, self.top_k, dtypes[col])
+                value_tables[col] = (values, counts)
+            else:
+                nulls, value_counts = _merge_categorical(parts)
+                null_counts[col] = nulls
+                distinct_counts[col] = len(value_counts)
+                top_values[col] = _categorical_top(value_counts, self.top_k)
+                value_tables[col] = value_counts
+
+        return Profile(self.n_rows if self.columns is not None else len(df), columns, dtypes,
+                       null_counts, distinct_counts, stats_frame(numeric_rows), top_values,
+                       value_tables=value_tables)
+
+
+def build_profile(df, top_k=TOP_K, chunk_rows=None, progress=None):
+    """Computes counts, nulls, min/max, mean/variance, quantiles, distinct counts and
+    top-k values for every column of a dataframe in a single pass per column block.
+
+    With `chunk_rows` the frame is profiled in row chunks whose statistics are merged
+    exactly, calling `progress` with the fraction of rows done before each chunk.
+    """
+    if chunk_rows is None:
+        return ProfileBuilder(top_k).add(df).result(df)
+    builder = ProfileBuilder(top_k)
+    for start in range(0, max(len(df), 1), chunk_rows):
+        if progress:
+            progress(start / max(len(df), 1))
+        builder.add(df.iloc[start:start + chunk_rows])
+    return builder.result(df)
+
+
+def _values_moments(values):
+    if not len(values):
+        return 0, 0.0, 0.0
+    mean = values.mean()
+    return len(values), mean, float(((values - mean) ** 2).sum())
+
+
+def _adjust_sorted_table(values, counts, removed, added):
+    """Returns a numeric value table with removed values decremented and added ones counted."""
+    counts = counts.copy()
+    for change, sign in ((removed, -1), (added, 1)):
+        if not len(change):
+            continue
+        keys, key_counts = np.unique(change, return_counts=True)
+        positions = np.searchsorted(values, keys)
+        present = positions < len(values)
+        present[present] = values[positions[present]] == keys[present]
+        np.add.at(counts, positions[present], sign * key_counts[present])
+        if sign > 0 and not present.all():
+            values = np.insert(values, positions[~present], keys[~present])
+            counts = np.insert(counts, positions[~present], key_counts[~present])
+    kept = counts > 0
+    return (values, counts) if kept.all() else (values[kept], counts[kept])
+
+
+def _adjust_counts_table(table, removed, added):
+    """Returns a categorical value table adjusted by removed and added values."""
+    changes = pd.concat([_categorical_column(added)["value_counts"],
+                         -_categorical_column(removed)["value_counts"]])
+    changes = changes.groupby(level=0, sort=False).sum()
+    changes = changes[changes != 0]
+    positions = table.index.get_indexer(changes.index)
+    existing = positions >= 0
+    counts = table.to_numpy().copy()
+    np.add.at(counts, positions[existing], changes.to_numpy()[existing])
+    new = changes[~existing & (changes.to_numpy() > 0)]
+    table = pd.Series(counts, index=table.index)
+    return pd.concat([table, new]) if len(new) else table
+
+
+def update_profile(profile, delta, n_rows, top_k=TOP_K):
+    """Returns a copy of an exact profile with cell-level edits applied.
+
+    `delta` maps each changed column to a (removed values, added values) pair of Series;
+    only those columns' statistics and value tables are touched.
+    """
+    null_counts = profile.null_counts.copy()
+    distinct_counts = profile.distinct_counts.copy()
+    numeric_stats = profile.numeric_stats.copy()
+    top_values = dict(profile.top_values)
+    value_tables = dict(profile.value_tables)
+
+    for col, (removed, added) in delta.items():
+        null_counts[col] += int(added.isna().sum()) - int(removed.isna().sum())
+        if col in numeric_stats.index:
+            removed_values = removed.to_numpy(dtype="float64", na_value=np.nan)
+            added_values = added.to_numpy(dtype="float64", na_value=np.nan)
+            removed_values = removed_values[~np.isnan(removed_values)]
+            added_values = added_values[~np.isnan(added_values)]
+
+            stats = numeric_stats.loc[col]
+            count = int(stats["count"])
+            m2 = stats["var"] * (count - 1) if count > 1 else 0.0
+            count, mean, m2 = remove_moments(count, stats["mean"] if count else 0.0, m2,
+                                             *_values_moments(removed_values))
+            count, mean, m2 = combine_moments(count, mean, m2, *_values_moments(added_values))
+            total = stats["sum"] - removed_values.sum() + added_values.sum()
+
+            values, counts = _adjust_sorted_table(*value_tables[col], removed_values, added_values)
+            value_tables[col] = (values, counts)
+            numeric_stats.loc[col] = pd.Series(
+                _numeric_stats(count, mean, m2, total, null_counts[col], values, counts)
+            )
+            distinct_counts[col] = len(values)
+            top_values[col] = _numeric_top(values, counts, top_k, profile.dtypes[col])
+        else:
+            table = _adjust_counts_table(value_tables[col], removed, added)
+            value_tables[col] = table
+            distinct_counts[col] = int((table.to_numpy() > 0).sum())
+            top_values[col] = _categorical_top(table, top_k)
+
+    return Profile(n_rows, profile.columns, profile.dtypes, null_counts, distinct_counts,
+                   numeric_stats, top_values, value_tables=value_tables)
@@ -0,0 +1,69 @@
+import hashlib
+import time
+from pathlib import Path
+
+from utils.dtypes import memory_usage
+
+
+def dataset_id(user, name):
+    """Returns the stable id of a user's dataset; the same upload gets the same id in every session."""
+    return hashlib.blake2b(f"{user}\0{name}".encode(), digest_size=8).hexdigest()
+
+
+class Dataset:
+    """A dataset held in the session: its profiler (which owns the frame) and persisted copy.
+
+    `path` points at the stored columnar copy while it matches the frame, and is cleared
+    once the frame is edited in memory. `spill_path` holds an edited frame the memory
+    governor evicted; either file is used to reload the frame when it is next read.
+    """
+
+    def __init__(self, name, profiler, path=None):
+        self.name = name
+        self.profiler = profiler
+        self.path = path
+        self.spill_path = None
+        self.last_used = time.monotonic()
+        self._sized = None
+
+    @property
+    def df(self):
+        return self.profiler.df
+
+    @property
+    def loaded(self):
+        return self.profiler.loaded
+
+    def memory_bytes(self):
+        """Returns the deep memory footprint of the frame, or 0 while it is spilled."""
+        if not self.loaded:
+            return 0
+        df = self.profiler.df
+        # Measured once per frame; deep sizing of object columns is not free
+        if self._sized is None or self._sized[0] != id(df):
+            self._sized = (id(df), memory_usage(df))
+        return self._sized[1]
+
+    def update(self, profiler):
+        """Replaces the profiler and frame after an edit; the stored copy no longer matches."""
+        self.path = None
+        self.discard_spill()
+        self.profiler = profiler
+
+    def discard_spill(self):
+        """Deletes the spill file of a frame that is no longer current."""
+        if self.spill_path is not None:
+            Path(self.spill_path).unlink(missing_ok=True)
+            self.spill_path = None
+
+
+def add_dataset(datasets, user, name, profiler, path=None):
+    """Registers a dataset in a session's {id: Dataset} registry and returns its id."""
+    key = dataset_id(user, name)
+    datasets[key] = Dataset(name, profiler, path)
+    return key
+
+
+def dataset_names(datasets):
+    """Returns {id: name} for a registry, in insertion order."""
+    return {key: dataset.name for key, dataset in datasets.items()}
@@ -0,0 +1,329 @@
+import numpy as np
+import pandas as pd
+
+from utils.dtypes import is_datetime, is_numeric
+from utils.profiling import (BLOCK_SIZE, QUANTILES, TOP_K, Profile, block_moments,
+                             combine_moments, stats_frame)
+
+# HyperLogLog precision: 2**14 registers, about 0.8% relative error
+HLL_PRECISION = 14
+# KLL compactor size: about 1.3% normalised rank error
+KLL_K = 200
+# Counters kept by the heavy-hitter summary
+HEAVY_HITTER_CAPACITY = 1024
+
+
+def count_values(values):
+    """Returns the distinct non-null values of a Series or array and their counts."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return np.asarray(uniques), counts
+
+
+def hash_values(values):
+    """Returns 64-bit hashes of an array of values."""
+    return pd.util.hash_array(np.asarray(values))
+
+
+class HyperLogLog:
+    """Mergeable distinct-count estimator."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype="uint8")
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, hashes):
+        """Adds 64-bit hashes to the sketch."""
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype("int64")
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # frexp gives the bit length of `rest`, so this is the position of its leading 1-bit
+        _, length = np.frexp(rest.astype("float64"))
+        np.maximum.at(self.registers, index, (bits - length + 1).astype("uint8"))
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype("int64")))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang and Liberty compactors)."""
+
+    def __init__(self, k=KLL_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self):
+        # Empirical 99% bound for a single quantile query
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) <= self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind; every other remaining item moves up with double weight
+                keep, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                compacted = True
+
+    def update(self, values):
+        """Adds the non-NaN values of a float array to the sketch."""
+        values = values[~np.isnan(values)]
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def weighted_items(self):
+        """Returns the retained items in sorted order and the number of values each stands for."""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def quantiles(self, qs):
+        if not self.n:
+            return np.full(len(qs), np.nan)
+        items, weights = self.weighted_items()
+        cumulative = np.cumsum(weights)
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side="left")
+        return items[np.minimum(positions, len(items) - 1)]
+
+
+class HeavyHitters:
+    """Mergeable frequent-items summary. Reported counts are lower bounds that undercount
+    by at most `error`."""
+
+    def __init__(self, capacity=HEAVY_HITTER_CAPACITY):
+        self.capacity = capacity
+        self.keys = np.empty(0, dtype=object)
+        self.counts = np.empty(0, dtype="int64")
+        self.error = 0
+
+    def _prune(self, keys, counts):
+        """Keeps the `capacity` largest counters, ties going to the earliest; a value that is
+        dropped and seen again undercounts by at most the largest dropped count."""
+        if len(counts) > self.capacity:
+            order = np.argsort(-counts, kind="stable")
+            kept, dropped = order[:self.capacity], order[self.capacity:]
+            self.error += int(counts[dropped].max())
+            keys, counts = keys[kept], counts[kept]
+        return keys, counts
+
+    def _combine(self, keys, counts):
+        keys = np.concatenate([self.keys, keys.astype(object)])
+        counts = np.concatenate([self.counts, counts])
+        codes, uniques = pd.factorize(keys)
+        self.keys, self.counts = self._prune(np.asarray(uniques, dtype=object),
+                                             np.bincount(codes, weights=counts).astype("int64"))
+
+    def update(self, keys, counts):
+        """Adds distinct values and their occurrence counts to the summary."""
+        # Pruning the chunk's own counts first keeps the merge small; the errors add up
+        self._combine(*self._prune(keys, counts))
+        return self
+
+    def merge(self, other):
+        self.error += other.error
+        self._combine(other.keys, other.counts)
+        return self
+
+    def top(self, k):
+        order = np.argsort(-self.counts, kind="stable")[:k]
+        return pd.Series(self.counts[order], index=pd.Index(self.keys[order], dtype=object))
+
+
+class _ColumnSketch:
+    def __init__(self, numeric):
+        self.numeric = numeric
+        self.null = 0
+        self.count, self.mean, self.m2, self.sum = 0, 0.0, 0.0, 0.0
+        self.min, self.max = np.inf, -np.inf
+        self.distinct = HyperLogLog()
+        self.quantiles = KLLSketch() if numeric else None
+        self.frequent = HeavyHitters()
+
+    def update(self, values):
+        """Feeds the values of one chunk to the distinct-count and frequent-item sketches,
+        hashing each distinct value once."""
+        keys, counts = count_values(values)
+        self.distinct.update(hash_values(keys))
+        self.frequent.update(keys, counts)
+
+    def merge(self, other):
+        self.null += other.null
+        if self.numeric and other.numeric:
+            self.count, self.mean, self.m2 = combine_moments(self.count, self.mean, self.m2,
+                                                             other.count, other.mean, other.m2)
+            self.sum += other.sum
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+            self.quantiles.merge(other.quantiles)
+        else:
+            self.numeric, self.quantiles = False, None
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+
+
+class ApproximateProfileBuilder:
+    """Builds a Profile from mergeable sketches: HyperLogLog distinct counts, KLL quantiles
+    and Misra-Gries top values. Each chunk costs one pass and no sort of the full column;
+    builders for different chunks can be combined with merge()."""
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self.n_rows = 0
+        self.columns = None
+        self.dtypes = None
+        self._sketches = {}
+
+    def add(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.dtypes = chunk.dtypes
+        self.n_rows += len(chunk)
+
+        numeric = [col for col in self.columns if is_numeric(chunk.dtypes[col])]
+        for start in range(0, len(numeric), BLOCK_SIZE):
+            names = numeric[start:start + BLOCK_SIZE]
+            block = chunk[names].to_numpy(dtype="float64", na_value=np.nan)
+            null_counts, counts, sums, means, m2 = block_moments(block)
+            with np.errstate(invalid="ignore"):
+                mins = np.where(np.isnan(block), np.inf, block).min(axis=0) if len(block) else np.full(len(names), np.inf)
+                maxs = np.where(np.isnan(block), -np.inf, block).max(axis=0) if len(block) else np.full(len(names), -np.inf)
+            for j, col in enumerate(names):
+                sketch = _ColumnSketch(True)
+                sketch.null, sketch.count, sketch.sum = int(null_counts[j]), int(counts[j]), sums[j]
+                sketch.mean, sketch.m2, sketch.min, sketch.max = means[j], m2[j], mins[j], maxs[j]
+                sketch.quantiles.update(block[:, j])
+                sketch.update(block[:, j])
+                self._merge_column(col, sketch)
+        for col in self.columns:
+            if col in numeric:
+                continue
+            series = chunk[col]
+            datetime = is_datetime(chunk.dtypes[col])
+            # Datetimes also get a quantile sketch of their nanoseconds, which drift bins on
+            sketch = _ColumnSketch(datetime)
+            sketch.null = int(series.isna().sum())
+            if datetime:
+                nanos = series.to_numpy(dtype="datetime64[ns]").view("int64").astype("float64")
+                sketch.quantiles.update(np.where(series.isna().to_numpy(), np.nan, nanos))
+            sketch.update(series)
+            self._merge_column(col, sketch)
+        return self
+
+    def _merge_column(self, col, sketch):
+        if col in self._sketches:
+            self._sketches[col].merge(sketch)
+        else:
+            self._sketches[col] = sketch
+
+    def merge(self, other):
+        """Combines the sketches of another builder fed with different rows of the same columns."""
+        if self.columns is None:
+            self.columns, self.dtypes = other.columns, other.dtypes
+        self.n_rows += other.n_rows
+        for col, sketch in other._sketches.items():
+            self._merge_column(col, sketch)
+        return self
+
+    def result(self, df=None):
+        columns = self.columns or (list(df.columns) if df is not None else [])
+        dtypes = df.dtypes if df is not None else self.dtypes
+        null_counts = pd.Series(0, index=columns, dtype="int64")
+        distinct_counts = pd.Series(0, index=columns, dtype="int64")
+        top_errors = pd.Series(0, index=columns, dtype="int64")
+        numeric_rows, top_values, value_tables = {}, {}, {}
+        for col in columns:
+            sketch = self._sketches[col]
+            null_counts[col] = sketch.null
+            distinct_counts[col] = sketch.distinct.estimate()
+            top_errors[col] = sketch.frequent.error
+            top = sketch.frequent.top(self.top_k)
+            value_tables[col] = sketch.frequent.top(sketch.frequent.capacity)
+            if is_numeric(dtypes[col]) and sketch.numeric:
+                count = sketch.count
+                var = sketch.m2 / (count - 1) if count > 1 else np.nan
+                row = {
+                    "count": float(count),
+                    "null": float(sketch.null),
+                    "sum": sketch.sum,
+                    "mean": sketch.mean if count else np.nan,
+                    "var": var,
+                    "std": np.sqrt(var),
+                    "min": sketch.min if count else np.nan,
+                    "max": sketch.max if count else np.nan,
+                }
+                for q, value in zip(QUANTILES, sketch.quantiles.quantiles(QUANTILES)):
+                    row[f"{q:.0%}"] = value
+                numeric_rows[col] = row
+                value_tables[col] = sketch.quantiles.weighted_items()
+                if pd.api.types.is_integer_dtype(dtypes[col]):
+                    top.index = top.index.astype("float64").astype(dtypes[col])
+            elif is_datetime(dtypes[col]) and sketch.numeric:
+                value_tables[col] = sketch.quantiles.weighted_items()
+                # Object arrays of datetime64 values hold them as nanosecond integers
+                top.index = pd.to_datetime(top.index.astype("int64"))
+            top_values[col] = top
+
+        error_bounds = {
+            "distinct_relative": HyperLogLog().relative_error,
+            "quantile_rank": KLLSketch().rank_error,
+            "top_count": top_errors,
+        }
+        return Profile(self.n_rows if self.columns is not None else len(df), columns, dtypes,
+                       null_counts, distinct_counts, stats_frame(numeric_rows), top_values,
+                       approximate=True, error_bounds=error_bounds, value_tables=value_tables)
+
+
+def build_approximate_profile(df, chunk_rows=250_000, top_k=TOP_K, progress=None):
+    """Profiles a dataframe chunk by chunk using sketches instead of exact statistics.
+
+    `progress` is called with the fraction of rows profiled before each chunk.
+    """
+    builder = ApproximateProfileBuilder(top_k)
+    for start in range(0, max(len(df), 1), chunk_rows):
+        if progress:
+            progress(start / max(len(df), 1))
+        builder.add(df.iloc[start:start + chunk_rows])
+    return builder.result(df)
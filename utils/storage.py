@@ -0,0 +1,53 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+# Extension of persisted datasets (Arrow IPC file format)
+STORE_SUFFIX = ".arrow"
+# Rows per record batch in persisted datasets
+BATCH_ROWS = 256 * 1024
+# Codec of datasets stored compressed; their batches are decompressed when read
+COMPRESSED_CODEC = "zstd"
+
+_NAME_KEY = b"eda.name"
+
+
+def write_dataset(df, path, name=None, compressed=False):
+    """Writes a dataframe to an Arrow IPC file, uncompressed so it can be memory-mapped
+    unless `compressed`, which keeps it small on disk at the cost of decompressing it on reads.
+
+    Pandas dtype metadata is kept in the schema so categoricals, nullable integers
+    and datetimes round-trip unchanged.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    if name is not None:
+        metadata[_NAME_KEY] = str(name).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        options = pa.ipc.IpcWriteOptions(compression=COMPRESSED_CODEC if compressed else None)
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table, max_chunksize=BATCH_ROWS)
+    os.replace(tmp_path, path)
+    return path
+
+
+def open_dataset(path):
+    """Memory-maps a persisted dataset and returns it as an Arrow table.
+
+    Uncompressed columns stay backed by the mapped file; compressed ones are
+    decompressed in full.
+    """
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def read_dataset(path):
+    """Loads a persisted dataset as a dataframe."""
+    # String columns come back Arrow-backed, as optimize_dtypes left them
+    with pd.option_context("mode.string_storage", "pyarrow"):
+        return open_dataset(path).to_pandas(split_blocks=True)
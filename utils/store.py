@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import uuid
+import weakref
+from pathlib import Path
+
+from utils.registry import dataset_id
+from utils.storage import STORE_SUFFIX, read_dataset, write_dataset
+
+# Parsed uploads, one immutable Arrow file per distinct content hash
+OBJECTS_DIR = "objects"
+# One small JSON file per (user, file name) naming the object it refers to
+REFS_DIR = "refs"
+# Raw uploads being received and hashed
+STAGING_DIR = "staging"
+
+# Object path -> the frame read from it, shared by every session while any holds it
+_frames = weakref.WeakValueDictionary()
+_frames_lock = threading.Lock()
+
+
+def shared_frame(path):
+    """Returns the in-memory frame of a stored object, reading it only if no session
+    holds it already. The frame is shared: edit a copy, never the frame itself."""
+    key = str(path)
+    with _frames_lock:
+        df = _frames.get(key)
+        if df is None:
+            df = _frames[key] = read_dataset(path)
+        return df
+
+
+class DatasetStore:
+    """Content-addressed store of parsed uploads.
+
+    Identical uploads hash to one immutable object, parsed and stored once. Each user's
+    file names are references to objects; an object is deleted once no reference to it
+    is left, so cleaning up after one user never touches another user's data. The sessions
+    holding each reference are tracked, so one session's logout leaves the files another
+    session of the same user still has open.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._locks = {}
+        self._lock = threading.Lock()
+        # Reference path -> ids of the live sessions holding it
+        self._holders = {}
+        for directory in (OBJECTS_DIR, REFS_DIR, STAGING_DIR):
+            (self.root / directory).mkdir(parents=True, exist_ok=True)
+
+    def object_path(self, content_hash):
+        return self.root / OBJECTS_DIR / f"{content_hash}{STORE_SUFFIX}"
+
+    def staging_path(self):
+        """Returns a fresh path to receive a raw upload at."""
+        return self.root / STAGING_DIR / f"{uuid.uuid4().hex}.part"
+
+    def lock(self, content_hash):
+        """Returns the lock serialising work on one object, so concurrent uploads of the
+        same content are parsed once."""
+        with self._lock:
+            return self._locks.setdefault(content_hash, threading.Lock())
+
+    def has(self, content_hash):
+        return self.object_path(content_hash).exists()
+
+    def put(self, content_hash, df, name=None, compressed=False):
+        """Stores a parsed frame under its content hash unless it is stored already, and
+        makes it the shared in-memory instance. `compressed` stores it compressed, as
+        write_dataset does. Returns the object path."""
+        path = self.object_path(content_hash)
+        if not path.exists():
+            write_dataset(df, path, name=name, compressed=compressed)
+        with _frames_lock:
+            _frames.setdefault(str(path), df)
+        return path
+
+    def open(self, content_hash):
+        """Returns the shared frame of a stored object."""
+        return shared_frame(self.object_path(content_hash))
+
+    def _ref_path(self, user, name):
+        return self.root / REFS_DIR / f"{dataset_id(user, name)}.json"
+
+    def hold(self, user, name, session):
+        """Records that a session has one of a user's files open."""
+        with self._lock:
+            self._holders.setdefault(str(self._ref_path(user, name)), set()).add(session)
+
+    def add_ref(self, user, name, content_hash, approximate=False, session=None):
+        """Points a user's file name at an object, releasing the object it pointed at before.
+        `approximate` records that the file is profiled with sketches and `session` the
+        session that holds it."""
+        path = self._ref_path(user, name)
+        previous = self._read_ref(path)
+        partial = path.with_name(path.name + ".tmp")
+        partial.write_text(json.dumps({"user": str(user), "name": str(name), "hash": content_hash,
+                                       "approximate": bool(approximate)}))
+        os.replace(partial, path)
+        if session is not None:
+            self.hold(user, name, session)
+        if previous is not None and previous["hash"] != content_hash:
+            self.collect_garbage([previous["hash"]])
+
+    @staticmethod
+    def _read_ref(path):
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _all_refs(self):
+        refs = []
+        for path in (self.root / REFS_DIR).glob("*.json"):
+            ref = self._read_ref(path)
+            if ref is not None:
+                refs.append((path, ref))
+        return refs
+
+    def refs(self, user):
+        """Returns (name, content hash, object path, approximate) for each file a user holds, oldest first."""
+        found = [(path, ref) for path, ref in self._all_refs() if ref["user"] == str(user)]
+        found.sort(key=lambda item: os.path.getmtime(item[0]))
+        return [(ref["name"], ref["hash"], self.object_path(ref["hash"]), ref.get("approximate", False)) for _, ref in found]
+
+    def ref_counts(self):
+        """Returns {content hash: number of references}."""
+        counts = {}
+        for _, ref in self._all_refs():
+            counts[ref["hash"]] = counts.get(ref["hash"], 0) + 1
+        return counts
+
+    def remove_ref(self, user, name):
+        """Drops one of a user's files, deleting its object if nothing else refers to it."""
+        path = self._ref_path(user, name)
+        ref = self._read_ref(path)
+        path.unlink(missing_ok=True)
+        with self._lock:
+            self._holders.pop(str(path), None)
+        if ref is not None:
+            self.collect_garbage([ref["hash"]])
+
+    def release_user(self, user):
+        """Drops all of a user's files (e.g. on logout); objects other users still refer to are kept."""
+        hashes = []
+        for path, ref in self._all_refs():
+            if ref["user"] == str(user):
+                path.unlink(missing_ok=True)
+                with self._lock:
+                    self._holders.pop(str(path), None)
+                hashes.append(ref["hash"])
+        self.collect_garbage(hashes)
+
+    def release_session(self, user, session):
+        """Drops the files a session of a user holds (e.g. on logout), except those another
+        live session of the user still holds."""
+        hashes = []
+        for path, ref in self._all_refs():
+            if ref["user"] != str(user):
+                continue
+            with self._lock:
+                holders = self._holders.get(str(path), set())
+                if session not in holders:
+                    continue
+                holders.discard(session)
+                if holders:
+                    continue
+                del self._holders[str(path)]
+            path.unlink(missing_ok=True)
+            hashes.append(ref["hash"])
+        self.collect_garbage(hashes)
+
+    def collect_garbage(self, hashes=None):
+        """Deletes the objects (all, or those among `hashes`) that no reference points at."""
+        counts = self.ref_counts()
+        if hashes is None:
+            hashes = [path.name[:-len(STORE_SUFFIX)] for path in (self.root / OBJECTS_DIR).glob(f"*{STORE_SUFFIX}")]
+        for content_hash in set(hashes):
+            if not counts.get(content_hash):
+                with self.lock(content_hash):
+                    if not self.ref_counts().get(content_hash):
+                        self.object_path(content_hash).unlink(missing_ok=True)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def dataset_store(root):
+    """Returns the store rooted at a directory, shared by every session using it."""
+    key = str(Path(root).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = DatasetStore(root)
+        return _stores[key]
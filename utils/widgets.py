@@ -0,0 +1,228 @@
+import os
+import uuid
+
+import streamlit as st
+
+from utils.csv_reader import COLUMN_TYPES
+from utils.data_utils import DataProfiler
+from utils.governor import governor
+from utils.ingest import ingest_uploads
+from utils.jobs import job_manager
+from utils.metrics import begin_trace, span
+from utils.registry import add_dataset, dataset_id
+from utils.store import dataset_store
+
+# Seconds between progress refreshes while a background job runs
+POLL_INTERVAL = 0.5
+# Shows the per-rerun timing panel in the sidebar, enabled with EDA_DEV_PANEL=1
+DEV_PANEL = os.environ.get("EDA_DEV_PANEL", "") not in ("", "0")
+# Reruns listed in the timing panel
+DEV_PANEL_RERUNS = 10
+# Upload extensions: CSVs, gzip/bz2/zstd compressed CSVs (e.g. .csv.gz) and zip archives of CSVs
+UPLOAD_TYPES = ["csv", "gz", "bz2", "zst", "zip"]
+
+
+def _job_slots():
+    if "jobs" not in st.session_state:
+        st.session_state.jobs = {}
+    return st.session_state.jobs
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _job_progress(slot, label):
+    job = _job_slots().get(slot)
+    if job is None or job.done:
+        # Rerun the whole page so it can use the result
+        st.rerun()
+    st.progress(job.progress, text=f"{label}: {job.stage} {job.progress:.0%}")
+    if st.button("Cancel", key=f"cancel_{slot}"):
+        st.session_state.cancelled_jobs[slot] = job.key
+        job_manager.release(_job_slots(), slot)
+        st.rerun()
+
+
+def await_job(slot, task, label):
+    """Runs a (cache key, compute) task as a background job without blocking the page.
+
+    The job becomes the one this session waits on in `slot`; whatever job the slot held
+    before is cancelled unless another session still needs it. Returns the result once
+    the job has finished; until then shows its progress with a Cancel button, refreshes
+    itself, and returns None. A cancelled task is not restarted until its key changes.
+    """
+    key, compute = task
+    cancelled = st.session_state.setdefault("cancelled_jobs", {})
+    if cancelled.get(slot) == key:
+        st.markdown(f'''
+            <div class="warning-box">
+                <span class="material-icons">warning</span> {label} was cancelled
+            </div>
+        ''', unsafe_allow_html=True)
+        if not st.button("Restart", key=f"restart_{slot}"):
+            return None
+    cancelled.pop(slot, None)
+    job = _job_slots().get(slot)
+    # A finished job stays in its slot, so a result too large for the cache is not recomputed
+    if job is None or job.key != key or not job.done or job.cancelled or job.error is not None:
+        job = job_manager.assign(_job_slots(), slot, job_manager.submit(key, compute))
+    if not job.done:
+        _job_progress(slot, label)
+        return None
+    if job.cancelled:
+        # Cancelled on behalf of another session; offer a restart on the next run
+        cancelled[slot] = key
+        st.rerun()
+    if job.error is not None:
+        st.markdown(f'''
+            <div class="error-box">
+                <span class="material-icons">error</span> {label} failed: {job.error}
+            </div>
+        ''', unsafe_allow_html=True)
+        return None
+    return job.result()
+
+
+def release_job(slot):
+    """Stops waiting on the job in a slot whose result is no longer shown."""
+    job_manager.release(_job_slots(), slot)
+
+
+def start_rerun(page):
+    """Starts timing this run of a page. A previous run that was cut short by st.stop or
+    st.rerun is closed first. Shows the developer timing panel if it is enabled."""
+    traces = st.session_state.setdefault("rerun_traces", [])
+    if traces and not traces[-1].finished:
+        traces[-1].finish(interrupted=True)
+    traces.append(begin_trace(page))
+    del traces[:-DEV_PANEL_RERUNS - 1]
+    if DEV_PANEL:
+        _timing_panel([trace for trace in traces if trace.finished])
+
+
+def end_rerun():
+    """Finishes timing a page run that reached the end of the script."""
+    traces = st.session_state.get("rerun_traces")
+    if traces:
+        traces[-1].finish()
+
+
+def _timing_panel(traces):
+    with st.sidebar.expander("Rerun timings", expanded=True):
+        if not traces:
+            st.caption("No completed reruns yet")
+            return
+        stages = list(dict.fromkeys(stage["stage"] for trace in traces for stage in trace.stages))
+        rows = []
+        for trace in reversed(traces):
+            times = {stage["stage"]: stage["seconds"] for stage in trace.stages}
+            rows.append(f'<tr><td>{trace.page}</td><td>{trace.seconds * 1000:.0f}</td>' +
+                        ''.join(f'<td>{times[name] * 1000:.0f}</td>' if name in times else '<td></td>' for name in stages) +
+                        '</tr>')
+        st.markdown('<table class="styled-table"><tr><th>Page</th><th>Total (ms)</th>' +
+                    ''.join(f'<th>{name}</th>' for name in stages) + '</tr>' + ''.join(rows) + '</table>',
+                    unsafe_allow_html=True)
+        # Spans of the latest rerun, totalled per name, slowest first
+        totals = {}
+        for item in traces[-1].spans:
+            calls, seconds, memory = totals.get(item["span"], (0, 0.0, 0))
+            totals[item["span"]] = (calls + 1, seconds + item["seconds"], memory + item["memory"])
+        spans = sorted(totals.items(), key=lambda entry: -entry[1][1])[:DEV_PANEL_RERUNS]
+        if spans:
+            st.markdown('<table class="styled-table"><tr><th>Span</th><th>Calls</th><th>ms</th><th>RSS change (MB)</th></tr>' +
+                        ''.join(f'<tr><td>{name}</td><td>{calls}</td><td>{seconds * 1000:.1f}</td>'
+                                f'<td>{memory / 1024 / 1024:+.1f}</td></tr>' for name, (calls, seconds, memory) in spans) +
+                        '</table>', unsafe_allow_html=True)
+
+
+def plotly_chart(fig):
+    """Renders a Plotly figure, timing its serialisation as the "plotly" span."""
+    with span("plotly"):
+        st.plotly_chart(fig)
+
+
+def session_key():
+    """Returns a random id for this browser session."""
+    return st.session_state.setdefault("session_key", uuid.uuid4().hex)
+
+
+def govern_memory(active):
+    """Marks the datasets a page shows as in use and lets the memory governor unload this
+    session's idle datasets if it is over budget."""
+    governor.use(session_key(), st.session_state.datasets.values(), active)
+
+
+def _ingest(uploaded_files, column_types=None):
+    """Ingests uploads with a progress bar each and registers the CSVs in them in the session."""
+    ambiguous = st.session_state.setdefault("ambiguous_columns", {})
+    uploads = st.session_state.setdefault("upload_datasets", {})
+    progress_bars = {uploaded_file.name: st.progress(0.0, text=f"Queued {uploaded_file.name}...") for uploaded_file in uploaded_files}
+    for uploaded_file, results, error in ingest_uploads(
+        uploaded_files,
+        dataset_store(st.session_state.uploads_dir),
+        st.session_state.user,
+        progress=lambda name, fraction, stage: progress_bars[name].progress(fraction, text=f"{stage} {name}... {fraction:.0%}"),
+        column_types=column_types,
+        session=session_key()
+    ):
+        progress_bars[uploaded_file.name].empty()
+        if error is None:
+            keys = []
+            for name, df, profile, content_hash, file_path, stats in results:
+                profiler = DataProfiler(df, fingerprint=content_hash, profile=profile)
+                key = add_dataset(st.session_state.datasets, st.session_state.user, name, profiler, file_path)
+                ambiguous[key] = (name, stats.ambiguous)
+                keys.append(key)
+                detail = stats.summary() if stats.engine else "already stored, not parsed again"
+                st.markdown(f'''
+                    <div class="success-box">
+                        <span class="material-icons">check_circle</span> Loaded {name} · {detail}
+                    </div>
+                ''', unsafe_allow_html=True)
+                if stats.fallback:
+                    st.markdown(f'''
+                        <div class="warning-box">
+                            <span class="material-icons">warning</span> {name} was parsed with pandas because the Arrow reader could not read it: {stats.fallback}
+                        </div>
+                    ''', unsafe_allow_html=True)
+            uploads[uploaded_file.name] = keys
+            st.toast(f"Loaded {uploaded_file.name}")
+        else:
+            st.markdown(f'''
+                <div class="error-box">
+                    <span class="material-icons">error</span> Error processing {uploaded_file.name}: {error}
+                </div>
+            ''', unsafe_allow_html=True)
+            st.toast(f"Failed to load {uploaded_file.name}")
+
+
+def _column_types_form(uploaded_file, key, name, columns):
+    with st.expander(f"Column types of {name}"):
+        st.caption("These columns could be read more than one way. Pick a type to re-parse the file with; "
+                   "values that do not fit become missing, and edits to this dataset are discarded.")
+        choices = {}
+        for col, reason in columns.items():
+            choices[col] = st.selectbox(f"{col} ({reason})", COLUMN_TYPES, key=f"column_type_{key}_{col}")
+        if st.button("Re-parse", key=f"reparse_{key}", disabled=all(choice == "Auto" for choice in choices.values())):
+            _ingest([uploaded_file], {name: choices})
+
+
+def _upload_keys(uploaded_file):
+    """Returns the ids of the datasets an upload was registered as; a zip archive holds several."""
+    uploads = st.session_state.get("upload_datasets", {})
+    return uploads.get(uploaded_file.name, [dataset_id(st.session_state.user, uploaded_file.name)])
+
+
+def ingest_new_uploads(uploaded_files):
+    """Ingests the uploaded files that are not in the session yet, concurrently, and offers
+    type overrides for the columns whose type was ambiguous in each CSV's sampled rows."""
+    if not uploaded_files:
+        return
+    new_files = [uploaded_file for uploaded_file in uploaded_files
+                 if any(key not in st.session_state.datasets for key in _upload_keys(uploaded_file))]
+    if new_files:
+        with st.spinner(f"Processing {len(new_files)} file{'s' if len(new_files) > 1 else ''}..."):
+            _ingest(new_files)
+    ambiguous = st.session_state.get("ambiguous_columns", {})
+    for uploaded_file in uploaded_files:
+        for key in _upload_keys(uploaded_file):
+            if key in ambiguous and ambiguous[key][1]:
+                _column_types_form(uploaded_file, key, *ambiguous[key])